@@ -11,6 +11,9 @@ from app.database.base import Base  # import your SQLAlchemy models' Base here
 # VigiPastore models
 from app.models.user import User  
 from app.models.vault import Vault  
+from app.models.token import RevokedToken
+from app.models.vault_tag import VaultTag
+from app.models.vault_tombstone import VaultTombstone
 
 # -------------------------------------------------------------
 # Alembic configuration
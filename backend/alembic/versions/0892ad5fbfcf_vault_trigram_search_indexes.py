@@ -0,0 +1,31 @@
+"""vault trigram search indexes
+
+Revision ID: 0892ad5fbfcf
+Revises: 0fb3fbe4a5bc
+Create Date: 2026-10-18 10:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0892ad5fbfcf'
+down_revision: Union[str, Sequence[str], None] = '0fb3fbe4a5bc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE INDEX ix_vaults_title_trgm ON vaults USING gin (lower(title) gin_trgm_ops)")
+    op.execute("CREATE INDEX ix_vaults_notes_trgm ON vaults USING gin (lower(notes) gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_vaults_notes_trgm', table_name='vaults')
+    op.drop_index('ix_vaults_title_trgm', table_name='vaults')
@@ -0,0 +1,28 @@
+"""vault (user_id, created_at, id) index
+
+Revision ID: 0fb3fbe4a5bc
+Revises: b388eb002f09
+Create Date: 2026-10-18 10:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0fb3fbe4a5bc'
+down_revision: Union[str, Sequence[str], None] = 'b388eb002f09'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_vaults_user_id_created_at', 'vaults', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_vaults_user_id_created_at', table_name='vaults')
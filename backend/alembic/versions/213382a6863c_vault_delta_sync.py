@@ -0,0 +1,45 @@
+"""vault delta sync
+
+Revision ID: 213382a6863c
+Revises: 30b5f29e2ffe
+Create Date: 2026-10-18 12:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '213382a6863c'
+down_revision: Union[str, Sequence[str], None] = '30b5f29e2ffe'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # updated_at used to default to the process start time; no row was changed
+    # before it was created, so created_at is the better lower bound
+    op.execute("UPDATE vaults SET updated_at = created_at WHERE updated_at IS NULL OR updated_at < created_at")
+    op.execute("UPDATE users SET updated_at = created_at WHERE updated_at IS NULL OR updated_at < created_at")
+    op.create_index('ix_vaults_user_id_updated_at', 'vaults', ['user_id', 'updated_at'], unique=False)
+
+    op.create_table('vault_tombstones',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.String(length=36), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_vault_tombstones_user_id_deleted_at', 'vault_tombstones', ['user_id', 'deleted_at'], unique=False)
+    op.create_index(op.f('ix_vault_tombstones_deleted_at'), 'vault_tombstones', ['deleted_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_vault_tombstones_deleted_at'), table_name='vault_tombstones')
+    op.drop_index('ix_vault_tombstones_user_id_deleted_at', table_name='vault_tombstones')
+    op.drop_table('vault_tombstones')
+    op.drop_index('ix_vaults_user_id_updated_at', table_name='vaults')
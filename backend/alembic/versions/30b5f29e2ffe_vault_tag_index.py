@@ -0,0 +1,54 @@
+"""vault tag index
+
+Revision ID: 30b5f29e2ffe
+Revises: 0892ad5fbfcf
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '30b5f29e2ffe'
+down_revision: Union[str, Sequence[str], None] = '0892ad5fbfcf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('vaults', sa.Column('tags_normalized', postgresql.ARRAY(sa.String()), nullable=True))
+    op.execute(
+        "UPDATE vaults SET tags_normalized = ARRAY(SELECT DISTINCT lower(t) FROM unnest(tags) AS t WHERE t <> '') "
+        "WHERE tags IS NOT NULL"
+    )
+    op.create_index('ix_vaults_tags_normalized', 'vaults', ['tags_normalized'], unique=False, postgresql_using='gin')
+
+    op.create_table('vault_tags',
+    sa.Column('user_id', sa.String(length=36), nullable=False),
+    sa.Column('tag', sa.String(), nullable=False),
+    sa.Column('display', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'tag')
+    )
+    # display form: the first spelling seen, as tag_crud does for live writes
+    # (the oldest record carrying the tag, first occurrence within it)
+    op.execute(
+        "INSERT INTO vault_tags (user_id, tag, display, count) "
+        "SELECT v.user_id, lower(u.t), (array_agg(u.t ORDER BY v.created_at, v.id, u.ord))[1], count(DISTINCT v.id) "
+        "FROM vaults v, unnest(v.tags) WITH ORDINALITY AS u(t, ord) "
+        "WHERE u.t <> '' "
+        "GROUP BY v.user_id, lower(u.t)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('vault_tags')
+    op.drop_index('ix_vaults_tags_normalized', table_name='vaults', postgresql_using='gin')
+    op.drop_column('vaults', 'tags_normalized')
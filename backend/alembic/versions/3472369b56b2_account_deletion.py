@@ -0,0 +1,39 @@
+"""account deletion
+
+Revision ID: 3472369b56b2
+Revises: c2a176e741fd
+Create Date: 2026-10-18 13:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3472369b56b2'
+down_revision: Union[str, Sequence[str], None] = 'c2a176e741fd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# tables whose user_id FK now cascades from users
+_USER_TABLES = ('vaults', 'vault_tags', 'vault_tombstones')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_users_deleted_at'), 'users', ['deleted_at'], unique=False)
+    for table in _USER_TABLES:
+        op.drop_constraint(f'{table}_user_id_fkey', table, type_='foreignkey')
+        op.create_foreign_key(f'{table}_user_id_fkey', table, 'users', ['user_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in _USER_TABLES:
+        op.drop_constraint(f'{table}_user_id_fkey', table, type_='foreignkey')
+        op.create_foreign_key(f'{table}_user_id_fkey', table, 'users', ['user_id'], ['id'])
+    op.drop_index(op.f('ix_users_deleted_at'), table_name='users')
+    op.drop_column('users', 'deleted_at')
@@ -0,0 +1,34 @@
+"""vault tombstones keyed per user
+
+Revision ID: 5d0e7c1a9b43
+Revises: 3472369b56b2
+Create Date: 2026-10-18 15:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0e7c1a9b43'
+down_revision: Union[str, Sequence[str], None] = '3472369b56b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_constraint('vault_tombstones_pkey', 'vault_tombstones', type_='primary')
+    op.create_primary_key('vault_tombstones_pkey', 'vault_tombstones', ['user_id', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # ids shared by several users' tombstones keep only the latest deletion
+    op.execute(
+        "DELETE FROM vault_tombstones t USING vault_tombstones newer "
+        "WHERE t.id = newer.id AND (t.deleted_at, t.user_id) < (newer.deleted_at, newer.user_id)"
+    )
+    op.drop_constraint('vault_tombstones_pkey', 'vault_tombstones', type_='primary')
+    op.create_primary_key('vault_tombstones_pkey', 'vault_tombstones', ['id'])
@@ -1,9 +1,11 @@
 from .user_api import router as user_router
 from .auth_api import router as auth_router
 from .vault_api import router as vault_router
+from .metrics_api import router as metrics_router
 
 __all__ = [
     "user_router",
     "auth_router",
-    "vault_router"
+    "vault_router",
+    "metrics_router"
 ]
\ No newline at end of file
@@ -1,55 +1,82 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from ...core.common import mask_email
+from ...core.rate_limit import admit_auth_email, admit_auth_request
+from ...core.serialization import MsgpackRoute, render
 from ...database import get_db
-from ...services.user_service import process_user_login_finish, process_user_login_start, process_user_register_finish, process_user_register_or_reset_start
-from ...schemas.user import AuthResponse, LoginFinishRequest, LoginStartRequest, LoginStartResponse, RegisterFinishRequest, RegisterFinishResponse, RegisterStartRequest, RegistrationStartResponse
+from ...services.errors import OVERLOAD_ERRORS
+from ...services.user_service import process_logout, process_token_refresh, process_user_login_finish, process_user_login_start, process_user_register_finish, process_user_register_or_reset_start
+from ...schemas.user import AuthResponse, LoginFinishRequest, LogoutRequest, RefreshTokenRequest, Token, LoginStartRequest, LoginStartResponse, RegisterFinishRequest, RegisterFinishResponse, RegisterStartRequest, RegistrationStartResponse
 import logging
 
 logger = logging.getLogger(__name__)
-router = APIRouter(prefix="/auth", tags=["authentication"])
+router = APIRouter(prefix="/auth", tags=["authentication"], route_class=MsgpackRoute)
 
 
-@router.post("/register/start", response_model=RegistrationStartResponse)
+@router.post("/register/start", response_model=RegistrationStartResponse, dependencies=[Depends(admit_auth_request)])
 async def register_start(request: RegisterStartRequest):
-    logger.info("Received registration start request from: %s", request.email)
+    admit_auth_email(request.email)
+    logger.debug("Received registration start request from: %s", mask_email(request.email))
 
-    response = process_user_register_or_reset_start(request)
+    response = await process_user_register_or_reset_start(request)
 
-    return response
+    return render(response)
 
-@router.post("/register/finish", response_model=RegisterFinishResponse)
+@router.post("/register/finish", response_model=RegisterFinishResponse, dependencies=[Depends(admit_auth_request)])
 async def register_finish(request: RegisterFinishRequest, db: AsyncSession = Depends(get_db)):
 
-    logger.info("Received registration finish request from: %s", request.user_info.email)
+    logger.debug("Received registration finish request from: %s", mask_email(request.user_info.email))
 
     response = await process_user_register_finish(request, db)
 
-    return response
+    return render(response)
 
-@router.post("/login/start", response_model=LoginStartResponse)
+@router.post("/login/start", response_model=LoginStartResponse, dependencies=[Depends(admit_auth_request)])
 async def login_start(request: LoginStartRequest, db: AsyncSession = Depends(get_db)):
-    logger.info("Received login start request from: %s", request.email)
+    admit_auth_email(request.email)
+    logger.debug("Received login start request from: %s", mask_email(request.email))
 
     try:
         response = await process_user_login_start(request, db)
-        logger.debug("Login start response: %s", response.login_response)
+        logger.debug("Login start response: %d bytes", len(response.login_response))
 
-        return response
+        return render(response)
+    except OVERLOAD_ERRORS:
+        raise
     except Exception as e:
         logger.error("Error printing login start response: %s", e)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@router.post("/login/finish", response_model=AuthResponse)
-async def login_finish(request: LoginFinishRequest, db: AsyncSession = Depends(get_db)):
-    logger.info("Received login finish request from: %s", request.email)
+@router.post("/login/finish", response_model=AuthResponse, dependencies=[Depends(admit_auth_request)])
+async def login_finish(request: LoginFinishRequest):
+    logger.debug("Received login finish request from: %s", mask_email(request.email))
 
     try:
-        response = await process_user_login_finish(request, db)
-        logger.debug("Login finish response: %s: %s", response.user.email, response.status)
+        response = await process_user_login_finish(request)
+        logger.debug("Login finish response: %s: %s", mask_email(response.user.email), response.status)
 
-        return response
+        return render(response)
+    except OVERLOAD_ERRORS:
+        raise
     except Exception as e:
         logger.error("Error printing login finish response: %s", e)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+
+
+@router.post("/token/refresh", response_model=Token)
+async def refresh_token(request: RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    logger.debug("Received token refresh request")
+
+    response = await process_token_refresh(request, db)
+
+    return render(response)
+
+@router.post("/logout")
+async def logout(request: LogoutRequest, db: AsyncSession = Depends(get_db)):
+    logger.debug("Received logout request")
+
+    revoked = await process_logout(request, db)
+
+    return render({"status": revoked})
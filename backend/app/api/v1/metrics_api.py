@@ -0,0 +1,16 @@
+
+from fastapi import APIRouter, HTTPException, status
+
+from ...core.config import settings
+from ...core.metrics import collect_stats
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("")
+async def get_metrics():
+    """Returns runtime stats for sizing pools, caches and queues."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    return collect_stats()
@@ -1,14 +1,18 @@
 
+import logging
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ...services.account_deletion_service import request_account_purge
 from ...services.user_service import process_get_user_record, process_reset_master_pwd_finish, process_user_register_or_reset_start, process_user_update_profile
 
 from ...schemas.user import ResetFinishRequest, ResetFinishResponse, ResetStartRequest, ResetStartResponse, UserProfile, UserPublicBase, UserRecord, UserRecordResponse
-from ...core.auth_filter import get_current_user_from_header
+from ...core.auth_filter import get_current_user_from_header, get_read_db
 from ...database import get_db
 from ...crud import user_crud
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/user", tags=["users"],
                    dependencies=[Depends(get_current_user_from_header)])
 
@@ -16,7 +20,7 @@ router = APIRouter(prefix="/user", tags=["users"],
 
 
 @router.get("/{user_id}/public", response_model=UserPublicBase)
-async def get_user(user_id: str, db: AsyncSession = Depends(get_db)):
+async def get_user(user_id: str, db: AsyncSession = Depends(get_read_db)):
     user = await user_crud.get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -24,7 +28,7 @@ async def get_user(user_id: str, db: AsyncSession = Depends(get_db)):
 
 # GET USER ACCOUNT RECORD
 @router.get("/{user_id}/record", response_model=UserRecord)
-async def get_user_record(user_id: str, db: AsyncSession = Depends(get_db),
+async def get_user_record(user_id: str, db: AsyncSession = Depends(get_read_db),
                           current_user=Depends(get_current_user_from_header)):
 
     response = await process_get_user_record(
@@ -39,7 +43,7 @@ async def get_user_record(user_id: str, db: AsyncSession = Depends(get_db),
 
 
 @router.get("/email/{email}", response_model=UserPublicBase)
-async def get_user_by_email(email: str, db: AsyncSession = Depends(get_db)):
+async def get_user_by_email(email: str, db: AsyncSession = Depends(get_read_db)):
     user = await user_crud.get_user_by_email(db, email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -60,14 +64,15 @@ async def update_email(user_id: str, new_email: str, db: AsyncSession = Depends(
 # DELETE USER BY ID
 
 
-@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/{user_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_user(user_id: str, db: AsyncSession = Depends(get_db)):
-    """Deletes a user record by ID."""
+    """Deletes a user by ID: the account is disabled now and its data purged in the background."""
     if not await user_crud.delete_user(db, user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    request_account_purge()
     return {"ok": True}
 
 # Update self user profile information
@@ -92,11 +97,11 @@ async def update_user_profile(
 async def reset_start(request: ResetStartRequest,
                       current_user=Depends(get_current_user_from_header)):
     
-    print("Received reset start request:", request)
+    logger.debug("Received reset start request for user: %s", current_user.id)
     if current_user.email != request.email:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
-    response = process_user_register_or_reset_start(request)
+    response = await process_user_register_or_reset_start(request)
 
     return response
 
@@ -105,7 +110,7 @@ async def reset_finish(request: ResetFinishRequest,
                        db: AsyncSession = Depends(get_db),
                        current_user=Depends(get_current_user_from_header)):
 
-    print("Received reset finish request:", request.user_id)
+    logger.debug("Received reset finish request for user: %s", request.user_id)
 
     if (current_user.id != request.user_id):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
@@ -1,12 +1,18 @@
 
 import urllib
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...services.vault_service import get_user_vault_by_id, get_user_vault_by_tag, get_user_vault_tags, get_user_vaults, get_vault_by_id, process_vault_add_update, process_vault_delete, search_vault_records
-from ...schemas.vault import VaultRecordRequest, VaultRecordResponse, VaultRecordsResponse, VaultTagsResponse
+from ...services.vault_service import export_user_vaults, get_user_vault_by_id, get_user_vault_by_tag, get_user_vault_tags, get_user_vaults_snapshot, get_vault_by_id, get_vault_etag, process_vault_add_update, process_vault_batch, process_vault_delete, process_vault_import, search_vault_records
+from ...services.vault_sync_service import get_vault_changes
+from ...schemas.vault import VaultBatchRequest, VaultBatchResponse, VaultChangesResponse, VaultCompactRecordsResponse, VaultImportResponse, VaultRecordRequest, VaultRecordResponse, VaultRecordsResponse, VaultTagsResponse
 from ...database import get_db
-from ...core.auth_filter import get_current_user_from_header
+from ...core.config import settings
+from ...core.auth_filter import get_current_user_from_header, get_read_db, get_read_session_factory
+from ...core.etag import etag_headers, not_modified_response
+from ...core.serialization import MsgpackRoute, render
+from ...core.snapshot_cache import SNAPSHOT_VARY, Snapshot, snapshot_response
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,7 +20,8 @@ logger = logging.getLogger(__name__)
 router = APIRouter(
     prefix="/vault",
     tags=["vault"],
-    dependencies=[Depends(get_current_user_from_header)]
+    dependencies=[Depends(get_current_user_from_header)],
+    route_class=MsgpackRoute
 )
 
 
@@ -29,32 +36,78 @@ async def add_update_record(
     # Set user_id from authenticated user to prevent unauthorized access
     request.user_id = current_user.id
 
-    response = await process_vault_add_update(request, db)
+    response = await process_vault_add_update(request, db, owner=current_user)
 
-    return response
+    return render(response)
 
-@router.get("/user", response_model=VaultRecordsResponse)
-async def get_vaults_record_for_user(
+@router.post("/batch", response_model=VaultBatchResponse)
+async def batch_vault_records(
+    request: VaultBatchRequest,
     current_user=Depends(get_current_user_from_header),
     db: AsyncSession = Depends(get_db)
+):
+    logger.debug("Received batch_vault_records request with %d operations", len(request.operations))
+
+    response = await process_vault_batch(request, current_user.id, db)
+
+    return render(response)
+
+@router.get("/user", response_model=VaultRecordsResponse | VaultCompactRecordsResponse)
+async def get_vaults_record_for_user(
+    limit: int | None = Query(None, ge=1, le=settings.VAULT_PAGE_MAX_LIMIT),
+    cursor: str | None = None,
+    compact: bool = False,
+    if_none_match: str | None = Header(None),
+    accept_encoding: str | None = Header(None),
+    current_user=Depends(get_current_user_from_header),
+    db: AsyncSession = Depends(get_read_db)
 ):
     logger.debug("Received get_vaults_record_for_user request for user ID: %s", current_user.id)
 
-    response = await get_user_vaults(current_user.id, db)
+    etag = await get_vault_etag(current_user.id, db)
+    not_modified = not_modified_response(etag, if_none_match, vary=SNAPSHOT_VARY)
+    if not_modified:
+        return not_modified
+
+    response = await get_user_vaults_snapshot(current_user.id, etag, db, limit=limit, cursor=cursor,
+                                              owner=current_user if compact else None)
+    if isinstance(response, Snapshot):
+        return snapshot_response(response, accept_encoding, etag_headers(etag))
 
-    return response
+    return render(response)
+
+@router.get("/changes", response_model=VaultChangesResponse)
+async def get_vault_changes_for_user(
+    since: str | None = None,
+    current_user=Depends(get_current_user_from_header),
+    db: AsyncSession = Depends(get_db)
+):
+    logger.debug("Received get_vault_changes_for_user request for user ID: %s", current_user.id)
+
+    # stays on the primary: a lagging replica would move the client's
+    # watermark past writes it has not seen
+
+    response = await get_vault_changes(current_user.id, since, db)
+
+    return render(response)
 
 @router.get("/user/{record_id}", response_model=VaultRecordResponse)
 async def get_vault_record(
     record_id: str,
+    if_none_match: str | None = Header(None),
     current_user=Depends(get_current_user_from_header),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     logger.debug("Received get_vault_record request for record ID: %s", record_id)
 
+    etag = await get_vault_etag(current_user.id, db)
+    not_modified = not_modified_response(etag, if_none_match)
+    if not_modified:
+        return not_modified
+
     response = await get_user_vault_by_id(db, record_id=record_id, user_id=current_user.id)
 
-    return response
+    return render(response, headers=etag_headers(etag))
 
 @router.delete("/{record_id}", response_model=VaultRecordResponse)
 async def delete_vault_record(
@@ -65,45 +118,81 @@ async def delete_vault_record(
     logger.debug("Received delete_vault_record request for record ID: %s", record_id)
 
     response = await process_vault_delete(record_id, current_user.id, db)  
-    return response
+    return render(response)
 
 @router.get("/tags", response_model=VaultTagsResponse)
 async def get_vault_tags_for_user(
+    if_none_match: str | None = Header(None),
     current_user=Depends(get_current_user_from_header),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     logger.debug("Received get_vault_tags_for_user request for user ID: %s", current_user.id)
 
+    etag = await get_vault_etag(current_user.id, db)
+    not_modified = not_modified_response(etag, if_none_match)
+    if not_modified:
+        return not_modified
+
     response = await get_user_vault_tags(current_user.id, db)
 
-    return response
+    return render(response, headers=etag_headers(etag))
 
-@router.get("/filter/{tag}", response_model=VaultRecordsResponse)
+@router.get("/filter/{tag}", response_model=VaultRecordsResponse | VaultCompactRecordsResponse)
 async def filter_vaults_by_tag(
     tag: str,
+    compact: bool = False,
     current_user=Depends(get_current_user_from_header),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     logger.debug("Received filter_vaults_by_tag request for tag: %s", tag)
 
     # decode url-encoded tag
     decoded_tag = urllib.parse.unquote(tag)
 
-    response = await get_user_vault_by_tag(current_user.id, decoded_tag, db)
+    response = await get_user_vault_by_tag(current_user.id, decoded_tag, db,
+                                           owner=current_user if compact else None)
 
-    return response
+    return render(response)
 
-@router.get("/search", response_model=VaultRecordsResponse)
+@router.get("/search", response_model=VaultRecordsResponse | VaultCompactRecordsResponse)
 async def search_vaults(
     query: str | None = None,
     tag: str | None = None,
+    limit: int | None = Query(None, ge=1, le=settings.VAULT_SEARCH_MAX_LIMIT),
+    compact: bool = False,
     current_user=Depends(get_current_user_from_header),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     logger.debug("Received search_vaults request for query: %s", query)
     decoded_query = urllib.parse.unquote(query) if query else None
     decoded_tag = urllib.parse.unquote(tag) if tag else None
 
-    response = await search_vault_records(current_user.id, decoded_query, decoded_tag, db)
+    response = await search_vault_records(current_user.id, decoded_query, decoded_tag, db,
+                                          owner=current_user if compact else None, limit=limit)
+
+    return render(response)
+
+@router.get("/export")
+async def export_vault_records(
+    current_user=Depends(get_current_user_from_header),
+    session_factory=Depends(get_read_session_factory)
+):
+    logger.debug("Received export_vault_records request for user ID: %s", current_user.id)
+
+    return StreamingResponse(
+        export_user_vaults(current_user.id, session_factory),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=vault-export.ndjson"}
+    )
+
+@router.post("/import", response_model=VaultImportResponse)
+async def import_vault_records(
+    http_request: Request,
+    current_user=Depends(get_current_user_from_header),
+    db: AsyncSession = Depends(get_db)
+):
+    logger.debug("Received import_vault_records request for user ID: %s", current_user.id)
+
+    response = await process_vault_import(current_user.id, http_request.stream(), db)
 
-    return response
\ No newline at end of file
+    return render(response)
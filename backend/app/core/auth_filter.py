@@ -5,24 +5,89 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt, JWTError
 
 from ..crud import user_crud
-from ..database.session import get_db
+from ..database.routing import recent_writes
+from ..database.session import AsyncSessionLocal, ReplicaSessionLocal, get_db, get_replica_db, replica_engine
+from .auth_jwt import ACCESS_TOKEN_TYPE
 from .config import settings
+from .principal_cache import principal_cache
+from .revocation import revocation_list
 
 security = HTTPBearer()
 
-async def get_current_user_from_header(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_db)):
+async def get_current_user_from_header(credentials: HTTPAuthorizationCredentials = Depends(security),
+                                       db: AsyncSession = Depends(get_db)):
     token = credentials.credentials
+
+    cached = principal_cache.get(token)
+    if cached is not None:
+        if await revocation_list.is_revoked(db, cached.claims["jti"]):
+            principal_cache.invalidate_token(cached.claims["jti"])
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+        return cached.user
+
     try:
         payload = jwt.decode(token, settings.API_SECRET_KEY, algorithms=[settings.ALGORITHM])
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication token")
 
     user_id = payload.get("sub")
-    if not user_id:
+    if not user_id or payload.get("type") != ACCESS_TOKEN_TYPE:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+    jti = payload.get("jti")
+    if jti and await revocation_list.is_revoked(db, jti):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+
+    # read on the primary: a replica copy could predate a profile change
+    # made through another worker (this runs only on principal cache misses)
     user = await user_crud.get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
-    return user
\ No newline at end of file
+    principal_cache.put(token, payload, user)
+    return user
+
+
+async def use_replica(user_id: str, db: AsyncSession, replica_db: AsyncSession) -> bool:
+    """Whether the user's reads can go to the replica without missing their own writes.
+
+    A write through this worker is known locally (recent_writes). Writes
+    through any other worker or host are detected by comparing the user's
+    write marker on both databases: two primary key lookups, each giving its
+    connection back right away. A caught-up result is reused for
+    DB_REPLICA_CHECK_CACHE_SECONDS.
+    """
+    if replica_engine is None:
+        return False
+    if recent_writes.active(user_id):
+        recent_writes.routed(on_replica=False)
+        return False
+    if recent_writes.caught_up(user_id):
+        recent_writes.routed(on_replica=True)
+        return True
+
+    marker = await user_crud.get_write_marker(db, user_id)
+    caught_up = marker is not None and marker == await user_crud.get_write_marker(replica_db, user_id)
+    recent_writes.routed(on_replica=caught_up, behind=not caught_up, user_id=user_id)
+    return caught_up
+
+
+async def get_read_db(current_user=Depends(get_current_user_from_header),
+                      db: AsyncSession = Depends(get_db),
+                      replica_db: AsyncSession = Depends(get_replica_db)) -> AsyncSession:
+    """Session for read-only endpoints: the replica, or the primary while the
+    current user's own writes have not reached the replica yet.
+
+    Sessions only check out a connection on their first query, so the one
+    left unused costs nothing.
+    """
+    return replica_db if await use_replica(current_user.id, db, replica_db) else db
+
+
+async def get_read_session_factory(current_user=Depends(get_current_user_from_header),
+                                   db: AsyncSession = Depends(get_db),
+                                   replica_db: AsyncSession = Depends(get_replica_db)):
+    """Session factory for a user's reads outside the request (e.g. streamed exports)."""
+    if await use_replica(current_user.id, db, replica_db):
+        return ReplicaSessionLocal
+    return AsyncSessionLocal
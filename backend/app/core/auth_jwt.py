@@ -4,12 +4,11 @@ from jose import jwt, JWTError
 import uuid
 from .config import settings
 
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
 
-# Create JWT access token
-def create_access_token(subject: str, *, expires_delta: Optional[timedelta] = None) -> str:
-   if expires_delta is None:
-        expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 
+def _create_token(subject: str, token_type: str, expires_delta: timedelta) -> str:
    now = datetime.now(timezone.utc)
    exp = now + expires_delta
    jti = str(uuid.uuid4())
@@ -19,12 +18,26 @@ def create_access_token(subject: str, *, expires_delta: Optional[timedelta] = No
         "iat": int(now.timestamp()),
         "exp": int(exp.timestamp()),
         "jti": jti,
-        "type": "access"
+        "type": token_type
    }
 
    token = jwt.encode(payload, settings.API_SECRET_KEY, algorithm=settings.ALGORITHM)
    return token
 
+# Create JWT access token
+def create_access_token(subject: str, *, expires_delta: Optional[timedelta] = None) -> str:
+   if expires_delta is None:
+        expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+
+   return _create_token(subject, ACCESS_TOKEN_TYPE, expires_delta)
+
+# Create JWT refresh token (exchanged for a new access token at /auth/token/refresh)
+def create_refresh_token(subject: str, *, expires_delta: Optional[timedelta] = None) -> str:
+   if expires_delta is None:
+        expires_delta = timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+
+   return _create_token(subject, REFRESH_TOKEN_TYPE, expires_delta)
+
 # Decode token
 def decode_token(token: str) -> dict:
     try:
@@ -1,4 +1,5 @@
 
+import base64
 import datetime
 
 
@@ -8,23 +9,32 @@ def base64url_to_base64(s: str) -> str:
     return s + padding
 
 def base64url_decode(s: str) -> bytes:
-    import base64
     return base64.urlsafe_b64decode(s + '=' * (-len(s) % 4))
 
 def base64url_encode(b: bytes) -> str:
-    import base64
     return base64.urlsafe_b64encode(b).decode('utf-8').rstrip('=')
 
 def base64_encode(b: bytes) -> str:
-    import base64
     return base64.b64encode(b).decode('utf-8')
 
 def base64_decode(s: str) -> bytes:
-    import base64
     return base64.b64decode(s)
 
+def encode_cursor(*parts: str) -> str:
+    """Packs keyset pagination values into an opaque, URL-safe cursor."""
+    return base64url_encode("\x1f".join(parts).encode('utf-8'))
+
+def decode_cursor(cursor: str) -> list[str]:
+    return base64url_decode(cursor).decode('utf-8').split("\x1f")
+
 def serialize_datetime(dt: datetime) -> str:
-    return dt.strftime("%Y-%m-%d %H:%M:%S")
+    # same output as strftime("%Y-%m-%d %H:%M:%S") for naive datetimes, several times faster
+    return dt.isoformat(sep=" ", timespec="seconds")
 
 def deserialize_datetime(date_string: str) -> datetime:
-    return datetime.strptime(date_string, "%Y-%m-%d %H:%M:%S")
\ No newline at end of file
+    return datetime.strptime(date_string, "%Y-%m-%d %H:%M:%S")
+
+def mask_email(email: str) -> str:
+    """Redacts an email for logs: "alice@example.com" -> "a***@example.com"."""
+    local, _, domain = email.partition('@')
+    return f"{local[:1]}***@{domain}" if domain else "***"
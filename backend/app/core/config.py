@@ -1,7 +1,8 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Literal, Optional
 import logging
-import sys
+
+from .logs import install, parse_sampling
 
 class Settings(BaseSettings):
     APP_VERSION: Optional[str] = "1.0.0"
@@ -13,10 +14,56 @@ class Settings(BaseSettings):
     DB_PASS: str
     DB_NAME: str
 
+    # Connection pool (per process). Checkouts wait at most DB_POOL_TIMEOUT
+    # seconds before the request fails with 503. Pre-ping: "always" (every
+    # checkout), "idle" (only after DB_POOL_PING_IDLE_SECONDS in the pool) or "never".
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: float = 3.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: Literal["always", "idle", "never"] = "idle"
+    DB_POOL_PING_IDLE_SECONDS: int = 30
+    DB_POOL_PREWARM: bool = True
+    # SQLAlchemy compiled statement cache (entries per engine) and asyncpg
+    # prepared statements kept per connection (0 disables, e.g. behind pgbouncer
+    # in transaction mode)
+    DB_QUERY_CACHE_SIZE: int = 1200
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500
+
+    # Total connections all server workers may open (python -m app.server);
+    # when set, each worker's pool is an equal share of it instead of
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW. The replica, if any, gets the same sizes.
+    DB_CONNECTION_BUDGET: int = 0
+
+    # Optional read replica (full SQLAlchemy URL, postgresql+asyncpg://...).
+    # Read-only endpoints use it unless the user's row on the replica is
+    # behind the primary's (their own recent writes have not arrived yet);
+    # the worker that handled a write skips that check for
+    # DB_READ_YOUR_WRITES_SECONDS and reads from the primary directly.
+    DB_REPLICA_DSN: Optional[str] = None
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0
+    # How long a worker trusts a "replica caught up" check for a user before
+    # comparing the markers again (0 compares on every read). A write made
+    # through another worker in that time can go unseen on this one for as
+    # long.
+    DB_REPLICA_CHECK_CACHE_SECONDS: float = 1.0
+
     # JWT Authentication Key for the API 
     API_SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7
+
+    # Token revocation list (Bloom filter in front of the revoked_tokens table)
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_FP_RATE: float = 0.001
+    REVOCATION_REFRESH_SECONDS: int = 30
+    # expired rows are deleted by a separate job, run by one worker at a time
+    REVOCATION_PURGE_SECONDS: int = 3600
+
+    # Cache of verified token -> loaded user, bounded per process
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_CACHE_TTL: int = 60  # seconds, capped by the token's exp
 
     # Security Configuration
     MASTER_KEY_KDF_SALT_LENGTH: int = 32 
@@ -25,39 +72,92 @@ class Settings(BaseSettings):
     SERVER_KEY: str
     SERVER_IDENTITY: str = "VigiPastore"
 
+    # OPAQUE crypto executor (keeps libopaque calls off the event loop)
+    OPAQUE_WORKERS: int = 4
+    OPAQUE_MAX_PENDING: int = 64
+
+    # Pending OPAQUE handshakes (state kept between the start and finish calls).
+    # Use "sqlite" when running more than one worker process. The SQLite file
+    # holds login secrets: keep it in a private directory, never a shared /tmp.
+    HANDSHAKE_STORE_BACKEND: str = "memory"
+    HANDSHAKE_STORE_PATH: str = "~/.local/state/vigipastore/handshake.db"
+    HANDSHAKE_STATE_TTL: int = 300  # seconds
+    HANDSHAKE_STORE_MAX_ENTRIES: int = 10000
+
+    # Admission control for the OPAQUE (/auth) endpoints
+    AUTH_RATE_LIMIT_IP_PER_MINUTE: int = 30
+    AUTH_RATE_LIMIT_IP_BURST: int = 10
+    AUTH_RATE_LIMIT_EMAIL_PER_MINUTE: int = 10
+    AUTH_RATE_LIMIT_EMAIL_BURST: int = 5
+    AUTH_RATE_LIMIT_MAX_KEYS: int = 100000
+    AUTH_MAX_INFLIGHT: int = 32
+    # Take the client address from X-Real-IP (only behind a trusted reverse proxy)
+    TRUST_PROXY_HEADERS: bool = False
+
+    # last_login_at updates are buffered and written in one batch this often
+    LOGIN_ACTIVITY_FLUSH_SECONDS: int = 5
+
+    # Vault listing pagination (GET /vault/user?limit=&cursor=)
+    VAULT_PAGE_MAX_LIMIT: int = 500
+    # Text search returns the top-K matches by similarity (tag-only filters are not capped)
+    VAULT_SEARCH_DEFAULT_LIMIT: int = 50
+    VAULT_SEARCH_MAX_LIMIT: int = 200
+    # NDJSON export/import: rows fetched / inserted per round trip, longest accepted import line
+    VAULT_EXPORT_BATCH_SIZE: int = 500
+    VAULT_IMPORT_BATCH_SIZE: int = 500
+    VAULT_IMPORT_MAX_LINE_BYTES: int = 64 * 1024
+    # Serialized, gzipped GET /vault/user responses kept in memory per worker
+    VAULT_SNAPSHOT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    VAULT_SNAPSHOT_COMPRESS_LEVEL: int = 6
+    # Most operations accepted by one POST /vault/batch
+    VAULT_BATCH_MAX_OPS: int = 500
+    # Delta sync (GET /vault/changes): watermark overlap that absorbs in-flight
+    # writes, how long delete tombstones are kept, and how often they are compacted
+    VAULT_SYNC_GRACE_SECONDS: int = 5
+    VAULT_TOMBSTONE_RETENTION_DAYS: int = 30
+    VAULT_TOMBSTONE_COMPACT_SECONDS: int = 3600
+    # Deleted accounts are purged in the background: rows removed per
+    # transaction, and how often the worker looks for accounts left pending
+    ACCOUNT_DELETE_CHUNK_SIZE: int = 1000
+    ACCOUNT_DELETE_POLL_SECONDS: int = 300
+
+    # Production server (python -m app.server): pre-forked workers sharing
+    # one socket; 0 workers means one per CPU core. On SIGTERM, workers get
+    # SERVER_GRACEFUL_TIMEOUT seconds to finish in-flight requests.
+    # The revocation filter and principal cache are per worker: after a
+    # logout, other workers may accept the access token for up to
+    # REVOCATION_REFRESH_SECONDS, and serve a cached user row for up to
+    # PRINCIPAL_CACHE_TTL after it changed. Refresh tokens are checked on the
+    # database and are not affected.
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 0
+    SERVER_BACKLOG: int = 2048
+    SERVER_KEEPALIVE_SECONDS: int = 5
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+
+    # /api/v1/metrics is unauthenticated and exposes pool, cache and queue
+    # internals: enable it only where the API is not publicly reachable
+    METRICS_ENABLED: bool = False
+
     LOG_LEVEL: str = "INFO"
-    
+    # "text" (colored, for a terminal) or "json" (one object per line)
+    LOG_FORMAT: Literal["text", "json"] = "text"
+    # records waiting for the writer thread; beyond this new ones are dropped
+    LOG_QUEUE_SIZE: int = 10000
+    # fraction of INFO/DEBUG lines kept per logger, e.g. "uvicorn.access=0.1,app.api=0.5"
+    LOG_SAMPLING: str = ""
+
     # Pydantic configuration to load variables from a .env file
     # In production (AWS), these would be loaded from environment variables
     model_config = SettingsConfigDict(env_file='.env')
 
 settings = Settings()
 
-class ColoredFormatter(logging.Formatter):
-    COLORS = {
-        'DEBUG': '\033[94m',    # Blue
-        'INFO': '\033[92m',     # Green
-        'WARNING': '\033[93m',  # Yellow
-        'ERROR': '\033[91m',    # Red
-        'CRITICAL': '\033[91m\033[1m',  # Red bold
-    }
-    RESET = '\033[0m'
-
-    def format(self, record):
-        levelname = record.levelname
-        if levelname in self.COLORS:
-            colored_levelname = f"{self.COLORS[levelname]}{levelname}{self.RESET}"
-            record.levelname = colored_levelname
-        return super().format(record)
-
 def setup_logging(level_str='INFO', format_str='%(levelname)s: \t %(asctime)s - %(name)s - %(message)s'):
-    """Reusable function to set up colored logging."""
+    """Reusable function to set up non-blocking (queued) logging."""
     level_str = settings.LOG_LEVEL.upper()  # Ensure uppercase
     level_int = getattr(logging, level_str, logging.INFO)
 
-    logger = logging.getLogger()
-    logger.setLevel(level_int)
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(ColoredFormatter(format_str))
-    logger.addHandler(handler)
-    return logger
\ No newline at end of file
+    return install(level_int, settings.LOG_FORMAT, format_str,
+                   settings.LOG_QUEUE_SIZE, parse_sampling(settings.LOG_SAMPLING))
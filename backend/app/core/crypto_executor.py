@@ -0,0 +1,161 @@
+import asyncio
+from dataclasses import dataclass
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import opaque
+
+from .common import base64url_decode
+from .config import settings
+from .metrics import register_stats
+
+
+class CryptoPoolBusy(Exception):
+    """Raised when the crypto executor already has too many pending operations."""
+
+
+@dataclass(frozen=True)
+class CryptoContext:
+    """Server-side OPAQUE parameters, decoded once at startup."""
+    server_key: bytes
+    server_identity: str
+    context: str
+
+    def ids_for(self, email: str) -> "opaque.Ids":
+        return opaque.Ids(email, self.server_identity)
+
+
+class _OpStats:
+    __slots__ = ("count", "errors", "total_ms", "max_ms", "wait_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.wait_ms = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "avg_wait_ms": round(self.wait_ms / self.count, 3) if self.count else 0.0,
+        }
+
+
+class CryptoExecutor:
+    """Bounded thread pool for blocking OPAQUE calls.
+
+    libopaque releases the GIL while it works, so a thread pool is enough to
+    keep the event loop responsive. Submissions beyond ``max_pending`` are
+    rejected with ``CryptoPoolBusy`` instead of queueing without limit.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self._workers = workers
+        self._max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="opaque")
+        self._lock = threading.Lock()
+        self._pending = 0   # submitted, not yet finished
+        self._running = 0   # currently executing on a worker
+        self._rejected = 0
+        self._ops: dict[str, _OpStats] = {}
+
+    async def run(self, op_name: str, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._pending >= self._max_pending:
+                self._rejected += 1
+                raise CryptoPoolBusy(f"crypto executor saturated ({self._pending} pending)")
+            self._pending += 1
+
+        submitted = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, self._call, op_name, submitted, fn, args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _call(self, op_name: str, submitted: float, fn: Callable[..., Any], args: tuple) -> Any:
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        failed = False
+        try:
+            return fn(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            finished = time.perf_counter()
+            elapsed_ms = (finished - started) * 1000
+            with self._lock:
+                self._running -= 1
+                op = self._ops.setdefault(op_name, _OpStats())
+                op.count += 1
+                op.errors += failed
+                op.total_ms += elapsed_ms
+                op.max_ms = max(op.max_ms, elapsed_ms)
+                op.wait_ms += (started - submitted) * 1000
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self._workers,
+                "max_pending": self._max_pending,
+                "pending": self._pending,
+                "running": self._running,
+                "queue_depth": self._pending - self._running,
+                "rejected": self._rejected,
+                "operations": {name: op.snapshot() for name, op in self._ops.items()},
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+# ---------------------------------------------------------------------
+# Shared instances
+# ---------------------------------------------------------------------
+crypto_context = CryptoContext(
+    server_key=base64url_decode(settings.SERVER_KEY),
+    server_identity=settings.SERVER_IDENTITY,
+    context=settings.SERVER_IDENTITY + "-" + settings.APP_VERSION,
+)
+
+crypto_executor = CryptoExecutor(settings.OPAQUE_WORKERS, settings.OPAQUE_MAX_PENDING)
+register_stats("crypto_executor", crypto_executor.stats)
+
+
+# ---------------------------------------------------------------------
+# OPAQUE operations
+# ---------------------------------------------------------------------
+async def create_registration_response(registration_request: bytes) -> tuple[bytes, bytes]:
+    """Returns (secS, pub) for a registration or master password reset."""
+    return await crypto_executor.run(
+        "create_registration_response",
+        opaque.CreateRegistrationResponse, registration_request, crypto_context.server_key,
+    )
+
+
+async def store_user_record(secS: bytes, registration_record: bytes) -> bytes:
+    """Finalizes the OPAQUE user record from the client's registration record."""
+    return await crypto_executor.run("store_user_record", opaque.StoreUserRecord, secS, registration_record)
+
+
+async def create_credential_response(login_request: bytes, user_record: bytes, email: str) -> tuple[bytes, bytes, bytes]:
+    """Returns (resp, sk, secS) for a login start."""
+    return await crypto_executor.run(
+        "create_credential_response",
+        opaque.CreateCredentialResponse,
+        login_request, user_record, crypto_context.ids_for(email), crypto_context.context,
+    )
+
+
+async def user_auth(secS: bytes, finish_login_request: bytes) -> None:
+    """Verifies the client's login finish message; raises on mismatch."""
+    await crypto_executor.run("user_auth", opaque.UserAuth, secS, finish_login_request)
@@ -0,0 +1,50 @@
+from typing import Optional
+
+from fastapi import Response, status
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the given version parts."""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def gzip_etag(etag: str) -> str:
+    """ETag of the gzip-encoded representation: RFC 9110 wants a distinct validator per content coding."""
+    return etag[:-1] + '-gzip"'
+
+
+def _matching_etag(if_none_match: Optional[str], etag: str) -> Optional[str]:
+    # the identity or gzip form of ``etag`` that the client sent, if any
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+
+    for tag in (tag.strip() for tag in if_none_match.split(",")):
+        tag = tag[2:] if tag.startswith("W/") else tag
+        if tag in (etag, gzip_etag(etag)):
+            return tag
+    return None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, per RFC 9110: a W/ prefix is ignored).
+
+    The gzip form of ``etag`` matches too: both encodings carry the same content.
+    """
+    return _matching_etag(if_none_match, etag) is not None
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    """Validator headers for a response labelled with ``etag``; clients must revalidate before reuse."""
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified_response(etag: str, if_none_match: Optional[str], vary: str = "Accept") -> Optional[Response]:
+    """Returns a 304 when the client already has ``etag`` (either encoding), else None."""
+    matched = _matching_etag(if_none_match, etag)
+    if matched is not None:
+        # a 304 repeats the validator and the Vary of the 200 it stands for
+        # (the vault routes negotiate on Accept)
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**etag_headers(matched), "Vary": vary})
+    return None
@@ -0,0 +1,192 @@
+from abc import ABC, abstractmethod
+import asyncio
+from collections import OrderedDict
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import msgpack
+
+from .config import settings
+from .metrics import register_stats
+
+
+def new_handshake_id() -> str:
+    """Returns an unguessable id for a pending OPAQUE handshake."""
+    return secrets.token_urlsafe(24)
+
+
+class HandshakeStateStore(ABC):
+    """Short-lived server state between the start and finish steps of an OPAQUE handshake."""
+
+    def __init__(self, namespace: str, ttl: int):
+        self.namespace = namespace
+        self.ttl = ttl
+
+    @abstractmethod
+    async def put(self, handshake_id: str, state: dict) -> None:
+        """Stores the state for a handshake; it expires after ``ttl`` seconds."""
+
+    @abstractmethod
+    async def pop(self, handshake_id: str) -> Optional[dict]:
+        """Removes and returns the state, or None if it is unknown or expired."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Returns a snapshot of the store's counters."""
+
+
+class MemoryHandshakeStore(HandshakeStateStore):
+    """Per-process store.
+
+    Every entry in a store shares the same TTL, so insertion order is also
+    expiry order: expired entries are always at the front of the OrderedDict
+    and are dropped in amortized O(1) per insert. ``max_entries`` caps memory
+    by evicting the oldest pending handshake.
+    """
+
+    def __init__(self, namespace: str, ttl: int, max_entries: int):
+        super().__init__(namespace, ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._expired = 0
+        self._evicted = 0
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            expires_at, _ = next(iter(self._entries.values()))
+            if expires_at > now:
+                break
+            self._entries.popitem(last=False)
+            self._expired += 1
+
+    async def put(self, handshake_id: str, state: dict) -> None:
+        now = time.monotonic()
+        self._expire(now)
+        while len(self._entries) >= self.max_entries:
+            self._entries.popitem(last=False)
+            self._evicted += 1
+        self._entries[handshake_id] = (now + self.ttl, state)
+
+    async def pop(self, handshake_id: str) -> Optional[dict]:
+        entry = self._entries.pop(handshake_id, None)
+        if entry is None:
+            return None
+        expires_at, state = entry
+        if expires_at <= time.monotonic():
+            self._expired += 1
+            return None
+        return state
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "expired": self._expired,
+            "evicted": self._evicted,
+        }
+
+
+class SqliteHandshakeStore(HandshakeStateStore):
+    """Store shared by every worker process on the host through one SQLite file.
+
+    Lets login/start and login/finish land on different workers. Expired rows
+    are removed through the ``expires_at`` index on each insert, so the
+    cleanup cost is proportional to what actually expired.
+
+    The file holds secrets -- OPAQUE server login state and encrypted vault
+    keys of in-flight handshakes -- so it is created readable by its owner
+    only (0600, in a 0700 directory if the directory is created here), and
+    rows are deleted as soon as they are popped.
+    """
+
+    def __init__(self, namespace: str, ttl: int, path: str):
+        super().__init__(namespace, ttl)
+        self.path = os.path.expanduser(path)
+        self._local = threading.local()
+        self._expired = 0
+        self._create_private_file()
+        self._init_schema()
+
+    def _create_private_file(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        # created before sqlite3 opens it (which would honour the umask, usually
+        # 0644); SQLite gives its -wal and -shm files the same permissions
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            os.fchmod(fd, 0o600)
+        finally:
+            os.close(fd)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS handshake_state ("
+            " namespace TEXT NOT NULL,"
+            " id TEXT NOT NULL,"
+            " state BLOB NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, id))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_handshake_state_expires_at ON handshake_state (expires_at)")
+        # not kept: the app may be imported before worker processes are forked
+        # (app.server), and a SQLite connection must not cross a fork
+        conn.close()
+        self._local.conn = None
+
+    def _put(self, handshake_id: str, state: dict) -> None:
+        now = time.time()
+        conn = self._connection()
+        expired = conn.execute("DELETE FROM handshake_state WHERE expires_at <= ?", (now,)).rowcount
+        self._expired += max(expired, 0)
+        conn.execute(
+            "INSERT OR REPLACE INTO handshake_state (namespace, id, state, expires_at) VALUES (?, ?, ?, ?)",
+            (self.namespace, handshake_id, msgpack.packb(state, use_bin_type=True), now + self.ttl),
+        )
+
+    def _pop(self, handshake_id: str) -> Optional[dict]:
+        row = self._connection().execute(
+            "DELETE FROM handshake_state WHERE namespace = ? AND id = ? RETURNING state, expires_at",
+            (self.namespace, handshake_id),
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return msgpack.unpackb(row[0], raw=False)
+
+    async def put(self, handshake_id: str, state: dict) -> None:
+        await asyncio.to_thread(self._put, handshake_id, state)
+
+    async def pop(self, handshake_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._pop, handshake_id)
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "path": self.path, "expired": self._expired}
+
+
+def create_handshake_store(namespace: str) -> HandshakeStateStore:
+    """Builds the store configured by HANDSHAKE_STORE_BACKEND and registers its stats."""
+    backend = settings.HANDSHAKE_STORE_BACKEND.lower()
+    if backend == "memory":
+        store = MemoryHandshakeStore(namespace, settings.HANDSHAKE_STATE_TTL, settings.HANDSHAKE_STORE_MAX_ENTRIES)
+    elif backend == "sqlite":
+        store = SqliteHandshakeStore(namespace, settings.HANDSHAKE_STATE_TTL, settings.HANDSHAKE_STORE_PATH)
+    else:
+        raise ValueError(f"Unknown HANDSHAKE_STORE_BACKEND: {settings.HANDSHAKE_STORE_BACKEND}")
+
+    register_stats(f"handshake_store.{namespace}", store.stats)
+    return store
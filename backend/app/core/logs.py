@@ -0,0 +1,174 @@
+import atexit
+import copy
+from datetime import datetime, timezone
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import os
+import queue
+import random
+import sys
+from typing import Optional
+
+from .metrics import register_stats
+
+_stats = {"queued": 0, "dropped": 0, "sampled_out": 0}
+_exception_formatter = logging.Formatter()
+
+
+class ColoredFormatter(logging.Formatter):
+    COLORS = {
+        'DEBUG': '\033[94m',    # Blue
+        'INFO': '\033[92m',     # Green
+        'WARNING': '\033[93m',  # Yellow
+        'ERROR': '\033[91m',    # Red
+        'CRITICAL': '\033[91m\033[1m',  # Red bold
+    }
+    RESET = '\033[0m'
+
+    def format(self, record):
+        levelname = record.levelname
+        if levelname in self.COLORS:
+            # color a copy: the record is shared with every other handler
+            record = copy.copy(record)
+            record.levelname = f"{self.COLORS[levelname]}{levelname}{self.RESET}"
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of the INFO/DEBUG records of chosen loggers.
+
+    ``rates`` maps a logger name (children included) to the fraction kept;
+    WARNING and above always pass.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def _rate(self, name: str) -> Optional[float]:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate is None or random.random() < rate:
+            return True
+        _stats["sampled_out"] += 1
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler over a bounded queue that drops records when it is full.
+
+    Logging calls only format the message and enqueue it; the write to
+    stdout happens on the listener thread, so a slow consumer costs log
+    lines instead of blocking the event loop.
+    """
+
+    def prepare(self, record):
+        # resolve args and the traceback now (they may not survive the thread
+        # hop), but leave the layout -- exception included -- to the formatter
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            _stats["queued"] += 1
+        except queue.Full:
+            _stats["dropped"] += 1
+
+
+def parse_sampling(spec: str) -> dict[str, float]:
+    """Parses ``"uvicorn.access=0.1,app.api=0.5"`` into {logger: rate}."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # a full queue must not fail shutdown: wait for the writer to make room
+        self.queue.put(self._sentinel)
+
+
+_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[_Listener] = None
+
+
+def _start_listener(queue_size: int, target: logging.Handler) -> None:
+    global _listener
+    _handler.queue = queue.Queue(maxsize=queue_size)
+    _listener = _Listener(_handler.queue, target, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flushes the queue and stops the listener thread (at exit, or before os._exit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def install(level: int, fmt: str, format_str: str, queue_size: int, sampling: dict[str, float]) -> logging.Logger:
+    """Routes the root logger through a bounded queue to a stdout writer thread."""
+    global _handler
+    root = logging.getLogger()
+    if _handler is not None:
+        # installed again (e.g. reloaded): replace the previous pipeline
+        stop_logging()
+        root.removeHandler(_handler)
+
+    target = logging.StreamHandler(sys.stdout)
+    target.setFormatter(JsonFormatter() if fmt == "json" else ColoredFormatter(format_str))
+
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    if sampling:
+        _handler.addFilter(SamplingFilter(sampling))
+    _start_listener(queue_size, target)
+
+    root.setLevel(level)
+    root.addHandler(_handler)
+    return root
+
+
+def _restart_in_child() -> None:
+    # the listener thread does not survive fork (app.server workers), and its
+    # queue's locks may have been held at that moment: start afresh
+    if _listener is not None:
+        _start_listener(_handler.queue.maxsize, _listener.handlers[0])
+
+
+os.register_at_fork(after_in_child=_restart_in_child)
+atexit.register(stop_logging)
+register_stats("logging", lambda: {**_stats, "pending": _handler.queue.qsize() if _handler else 0})
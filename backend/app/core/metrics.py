@@ -0,0 +1,15 @@
+from typing import Callable
+
+# Registry of stats providers, keyed by component name.
+# Each provider returns a JSON-serializable dict snapshot.
+_providers: dict[str, Callable[[], dict]] = {}
+
+
+def register_stats(name: str, provider: Callable[[], dict]) -> None:
+    """Registers a stats provider exposed through the metrics endpoint."""
+    _providers[name] = provider
+
+
+def collect_stats() -> dict[str, dict]:
+    """Collects a snapshot from every registered provider."""
+    return {name: provider() for name, provider in _providers.items()}
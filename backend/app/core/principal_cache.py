@@ -0,0 +1,112 @@
+from collections import OrderedDict
+import hmac
+import time
+from typing import Any, NamedTuple, Optional
+
+from jose import jwt, JWTError
+
+from .config import settings
+from .metrics import register_stats
+
+
+class Principal(NamedTuple):
+    claims: dict
+    user: Any
+
+
+class _Entry(NamedTuple):
+    token: str
+    principal: Principal
+    expires_at: float
+
+
+class PrincipalCache:
+    """Bounded LRU of authenticated principals, keyed by token ``jti``.
+
+    An entry lives at most ``ttl`` seconds and never past the token's own
+    ``exp``. Writes to a user row must call ``invalidate_user`` so that a
+    cached copy never outlives the change.
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._jtis_by_user: dict[str, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[Principal]:
+        try:
+            jti = jwt.get_unverified_claims(token).get("jti")
+        except JWTError:
+            jti = None
+
+        entry = self._entries.get(jti) if jti else None
+        # the token must match byte for byte: only then do the cached,
+        # already-verified claims apply to it
+        if entry is None or not hmac.compare_digest(entry.token, token):
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.time():
+            self._remove(jti)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(jti)
+        self.hits += 1
+        return entry.principal
+
+    def put(self, token: str, claims: dict, user: Any) -> None:
+        jti = claims.get("jti")
+        if not jti:
+            return
+
+        expires_at = min(time.time() + self.ttl, claims.get("exp", 0))
+        self._remove(jti)
+        while len(self._entries) >= self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+        self._entries[jti] = _Entry(token, Principal(claims, user), expires_at)
+        self._jtis_by_user.setdefault(str(user.id), set()).add(jti)
+
+    def invalidate_token(self, jti: str) -> None:
+        if jti in self._entries:
+            self._remove(jti)
+            self.invalidations += 1
+
+    def invalidate_user(self, user_id: str) -> None:
+        for jti in self._jtis_by_user.pop(str(user_id), set()):
+            if self._entries.pop(jti, None) is not None:
+                self.invalidations += 1
+
+    def _remove(self, jti: str) -> None:
+        entry = self._entries.pop(jti, None)
+        if entry is None:
+            return
+        user_id = str(entry.principal.user.id)
+        jtis = self._jtis_by_user.get(user_id)
+        if jtis is not None:
+            jtis.discard(jti)
+            if not jtis:
+                del self._jtis_by_user[user_id]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_MAX_ENTRIES, settings.PRINCIPAL_CACHE_TTL)
+register_stats("principal_cache", principal_cache.stats)
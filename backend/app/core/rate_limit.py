@@ -0,0 +1,146 @@
+from collections import OrderedDict
+import math
+import time
+
+from fastapi import HTTPException, Request, status
+
+from .config import settings
+from .metrics import register_stats
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets kept in a size-bounded LRU.
+
+    Each key may spend ``burst`` requests at once and regains
+    ``rate_per_minute`` per minute. When more than ``max_keys`` keys are
+    tracked, the least recently seen key is forgotten.
+    """
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_keys: int):
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list[float]]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+
+    def acquire(self, key: str) -> float:
+        """Takes one token for ``key``; returns 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            while len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+            bucket = self._buckets[key] = [float(self.burst), now]
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            self.allowed += 1
+            return 0.0
+
+        self.rejected += 1
+        return (1 - bucket[0]) / self.rate if self.rate > 0 else 60.0
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._buckets),
+            "max_keys": self.max_keys,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+class ConcurrencyLimiter:
+    """Non-blocking cap on in-flight operations."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+auth_ip_limiter = TokenBucketLimiter(
+    "ip",
+    settings.AUTH_RATE_LIMIT_IP_PER_MINUTE,
+    settings.AUTH_RATE_LIMIT_IP_BURST,
+    settings.AUTH_RATE_LIMIT_MAX_KEYS,
+)
+auth_email_limiter = TokenBucketLimiter(
+    "email",
+    settings.AUTH_RATE_LIMIT_EMAIL_PER_MINUTE,
+    settings.AUTH_RATE_LIMIT_EMAIL_BURST,
+    settings.AUTH_RATE_LIMIT_MAX_KEYS,
+)
+auth_inflight_limiter = ConcurrencyLimiter(settings.AUTH_MAX_INFLIGHT)
+
+register_stats("auth_admission", lambda: {
+    "ip": auth_ip_limiter.stats(),
+    "email": auth_email_limiter.stats(),
+    "in_flight": auth_inflight_limiter.stats(),
+})
+
+
+def _too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests, please retry later",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def client_ip(request: Request) -> str:
+    """Client address, taken from the reverse proxy's X-Real-IP when trusted."""
+    if settings.TRUST_PROXY_HEADERS:
+        real_ip = request.headers.get("x-real-ip")
+        if real_ip:
+            return real_ip.strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def admit_auth_request(request: Request):
+    """Dependency for OPAQUE endpoints: per-IP bucket plus the global in-flight cap.
+
+    Runs before the handler, so rejected requests never reach the DB or crypto.
+    """
+    retry_after = auth_ip_limiter.acquire(client_ip(request))
+    if retry_after:
+        raise _too_many_requests(retry_after)
+
+    if not auth_inflight_limiter.try_acquire():
+        raise _too_many_requests(1)
+    try:
+        yield
+    finally:
+        auth_inflight_limiter.release()
+
+
+def admit_auth_email(email: str) -> None:
+    """Per-account bucket; call first thing in handlers that take an email."""
+    retry_after = auth_email_limiter.acquire(email.lower())
+    if retry_after:
+        raise _too_many_requests(retry_after)
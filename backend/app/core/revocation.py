@@ -0,0 +1,160 @@
+import asyncio
+from datetime import datetime
+import hashlib
+import logging
+import math
+from typing import Iterable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..crud import token_crud
+from .config import settings
+from .metrics import register_stats
+from .principal_cache import principal_cache
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives)."""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        capacity = max(capacity, 1)
+        self.num_bits = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # double hashing: two 64-bit halves of one digest give k positions
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationList:
+    """In-memory front for the revoked_tokens table.
+
+    The common case (token not revoked) is answered by the Bloom filter with
+    no I/O; only possible hits go to the database. The filter is rebuilt
+    from the table periodically, which also drops tokens past their exp.
+
+    The filter is per process: a token revoked on one worker of app.server
+    is only seen by the others after their next rebuild
+    (REVOCATION_REFRESH_SECONDS). Refresh tokens do not go through it.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self._filter = BloomFilter(capacity, fp_rate)
+        self._added_during_rebuild: Optional[list[str]] = None
+        self.checks = 0
+        self.filter_hits = 0
+        self.confirmed = 0
+        self.rebuilds = 0
+        self.last_rebuild: Optional[datetime] = None
+
+    def add(self, jti: str) -> None:
+        self._filter.add(jti)
+        if self._added_during_rebuild is not None:
+            self._added_during_rebuild.append(jti)
+
+    async def is_revoked(self, session: AsyncSession, jti: str) -> bool:
+        self.checks += 1
+        if jti not in self._filter:
+            return False
+
+        self.filter_hits += 1
+        revoked = await token_crud.is_token_revoked(session, jti)
+        self.confirmed += revoked
+        return revoked
+
+    async def rebuild(self, session: AsyncSession) -> None:
+        self._added_during_rebuild = []
+        try:
+            jtis = await token_crud.get_active_revoked_jtis(session)
+
+            new_filter = BloomFilter(max(self.capacity, len(jtis) * 2), self.fp_rate)
+            for jti in jtis:
+                new_filter.add(jti)
+            # revocations made locally while the table was being read
+            for jti in self._added_during_rebuild:
+                new_filter.add(jti)
+
+            self._filter = new_filter
+            self.rebuilds += 1
+            self.last_rebuild = datetime.now()
+        finally:
+            self._added_during_rebuild = None
+
+    def stats(self) -> dict:
+        return {
+            "entries": self._filter.count,
+            "bits": self._filter.num_bits,
+            "hashes": self._filter.num_hashes,
+            "checks": self.checks,
+            "filter_hits": self.filter_hits,
+            "confirmed_revoked": self.confirmed,
+            "rebuilds": self.rebuilds,
+            "last_rebuild": self.last_rebuild.isoformat() if self.last_rebuild else None,
+        }
+
+
+revocation_list = RevocationList(settings.REVOCATION_BLOOM_CAPACITY, settings.REVOCATION_BLOOM_FP_RATE)
+register_stats("revocation_list", revocation_list.stats)
+
+
+async def revoke_token_claims(session: AsyncSession, claims: dict) -> bool:
+    """Revokes a decoded token until its exp; returns False if it already was."""
+    jti = claims.get("jti")
+    if not jti:
+        return False
+
+    revoked = await token_crud.revoke_token(
+        session,
+        jti=jti,
+        user_id=claims.get("sub"),
+        expires_at=datetime.fromtimestamp(claims["exp"]),
+    )
+    revocation_list.add(jti)
+    principal_cache.invalidate_token(jti)
+    return revoked
+
+
+async def run_revocation_refresher(session_factory, interval: int) -> None:
+    """Lifespan task: rebuilds the revocation filter every ``interval`` seconds."""
+    while True:
+        try:
+            async with session_factory() as session:
+                await revocation_list.rebuild(session)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Failed to rebuild token revocation filter: %s", e)
+        await asyncio.sleep(interval)
+
+
+async def run_revocation_purger(session_factory, interval: int) -> None:
+    """Lifespan task: deletes revocations past their exp every ``interval`` seconds."""
+    while True:
+        try:
+            async with session_factory() as session:
+                removed = await token_crud.delete_expired_revocations(session)
+                if removed:
+                    logger.info("Purged %d expired token revocations", removed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Failed to purge expired token revocations: %s", e)
+        await asyncio.sleep(interval)
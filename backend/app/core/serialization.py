@@ -0,0 +1,159 @@
+from contextvars import ContextVar
+from functools import lru_cache
+import json
+from typing import Any, Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+import msgpack
+from pydantic import BaseModel, TypeAdapter
+
+from .common import base64url_encode
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# set per request by MsgpackRoute from the Accept header
+_msgpack_requested: ContextVar[bool] = ContextVar("msgpack_requested", default=False)
+
+
+def _encode_bytes(value: Any) -> str:
+    # JSON has no binary type: bytes left in plain data go out as base64url
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64url_encode(bytes(value))
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_dumps(content: Any) -> bytes:
+    """Compact JSON bytes for plain data (orjson when available); bytes become base64url."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_encode_bytes)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_encode_bytes).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def type_adapter(tp: Any) -> TypeAdapter:
+    """One TypeAdapter per type; building them compiles a (de)serializer, so they are reused."""
+    return TypeAdapter(tp)
+
+
+def dump_json(content: Any) -> bytes:
+    """Serializes a response payload: models through their cached adapter, plain data directly."""
+    if isinstance(content, BaseModel):
+        return type_adapter(type(content)).dump_json(content)
+    return json_dumps(content)
+
+
+def dump_msgpack(content: Any) -> bytes:
+    """Serializes a response payload to msgpack; binary fields stay raw bytes."""
+    if isinstance(content, BaseModel):
+        # python mode: Base64UrlBytes fields are only encoded for JSON
+        content = type_adapter(type(content)).dump_python(content)
+    return msgpack.packb(content, use_bin_type=True)
+
+
+class FastJSONResponse(Response):
+    """JSON response that is written as bytes without a second validation pass.
+
+    Returning a Response from an endpoint bypasses FastAPI's response_model
+    validation, which is only kept on the route for the OpenAPI schema.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+class MsgpackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return dump_msgpack(content)
+
+
+def msgpack_requested() -> bool:
+    """Whether the current request asked for a msgpack response."""
+    return _msgpack_requested.get()
+
+
+def encode(content: Any) -> tuple[bytes, str]:
+    """Serializes a payload in the negotiated format; returns (body, media type)."""
+    if msgpack_requested():
+        return dump_msgpack(content), MsgpackResponse.media_type
+    return dump_json(content), FastJSONResponse.media_type
+
+
+def render(content: Any, status_code: int = 200, headers: Optional[dict[str, str]] = None) -> Response:
+    """Renders a payload in the format negotiated for the current request."""
+    response_class = MsgpackResponse if msgpack_requested() else FastJSONResponse
+    response = response_class(content, status_code=status_code, headers=headers)
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+def _is_msgpack(media_type: Optional[str]) -> bool:
+    return bool(media_type) and media_type.split(";", 1)[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+
+def _accepts_msgpack(accept: Optional[str]) -> bool:
+    """Whether an Accept header prefers msgpack: listed with q > 0 and not below JSON's q."""
+    if not accept:
+        return False
+
+    msgpack_q = json_q = 0.0
+    for entry in accept.split(","):
+        media_type, *params = entry.split(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type == "application/json":
+            json_q = max(json_q, q)
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+
+class MsgpackRequest(Request):
+    """Request whose body is msgpack, exposed to FastAPI through ``json()``."""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(await self.body(), raw=False)
+        return self._json
+
+
+class MsgpackRoute(APIRoute):
+    """Route that accepts ``Content-Type: application/msgpack`` bodies and records
+    whether the client ``Accept``s msgpack, for ``render`` to pick the response format.
+    """
+
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+
+        async def handler(request: Request) -> Response:
+            token = _msgpack_requested.set(_accepts_msgpack(request.headers.get("accept")))
+            try:
+                if _is_msgpack(request.headers.get("content-type")):
+                    # FastAPI only parses JSON bodies; present this one as JSON
+                    # and let MsgpackRequest.json() decode it
+                    scope = dict(request.scope)
+                    scope["headers"] = [
+                        (name, b"application/json" if name == b"content-type" else value)
+                        for name, value in request.scope["headers"]
+                    ]
+                    request = MsgpackRequest(scope, request.receive)
+                return await route_handler(request)
+            finally:
+                _msgpack_requested.reset(token)
+
+        return handler
@@ -0,0 +1,122 @@
+from collections import OrderedDict
+import gzip
+from typing import Hashable, NamedTuple, Optional
+
+from fastapi import Response
+
+from .config import settings
+from .etag import gzip_etag
+from .metrics import register_stats
+
+# snapshot responses are negotiated on both the format and the encoding
+SNAPSHOT_VARY = "Accept, Accept-Encoding"
+
+
+class Snapshot(NamedTuple):
+    etag: str
+    media_type: str
+    body: bytes      # gzip-compressed
+    raw_size: int
+
+
+class SnapshotCache:
+    """Per-user LRU of serialized, gzip-compressed list responses, bounded by total bytes.
+
+    An entry is only served while its ETag matches the one just read from the
+    user's vault version, so entries written by another worker's view of the
+    vault are never returned stale. Local writes also call ``invalidate_user``
+    so memory is released straight away.
+    """
+
+    def __init__(self, max_bytes: int, compress_level: int):
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self._entries: "OrderedDict[tuple[str, Hashable], Snapshot]" = OrderedDict()
+        self._keys_by_user: dict[str, set[tuple[str, Hashable]]] = {}
+        self.bytes = 0
+        self.raw_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.oversized = 0
+
+    def get(self, user_id: str, variant: Hashable, etag: str) -> Optional[Snapshot]:
+        key = (user_id, variant)
+        snapshot = self._entries.get(key)
+        if snapshot is None or snapshot.etag != etag:
+            if snapshot is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return snapshot
+
+    def put(self, user_id: str, variant: Hashable, etag: str, media_type: str, body: bytes) -> Snapshot:
+        """Compresses and stores ``body``; returns the snapshot even when it is too large to keep."""
+        snapshot = Snapshot(etag, media_type, gzip.compress(body, self.compress_level), len(body))
+        # one huge vault must not flush everybody else's entries
+        if len(snapshot.body) > self.max_bytes // 4:
+            self.oversized += 1
+            return snapshot
+
+        key = (user_id, variant)
+        self._remove(key)
+        while self._entries and self.bytes + len(snapshot.body) > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+        self._entries[key] = snapshot
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+        self.bytes += len(snapshot.body)
+        self.raw_bytes += snapshot.raw_size
+        return snapshot
+
+    def invalidate_user(self, user_id: str) -> None:
+        for key in list(self._keys_by_user.get(str(user_id), ())):
+            self._remove(key)
+            self.invalidations += 1
+
+    def _remove(self, key: tuple[str, Hashable]) -> None:
+        snapshot = self._entries.pop(key, None)
+        if snapshot is None:
+            return
+        self.bytes -= len(snapshot.body)
+        self.raw_bytes -= snapshot.raw_size
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "uncompressed_bytes": self.raw_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "oversized": self.oversized,
+        }
+
+
+def snapshot_response(snapshot: Snapshot, accept_encoding: Optional[str], headers: dict[str, str]) -> Response:
+    """Serves a snapshot as is to gzip-capable clients, decompressed to the rest."""
+    headers = {**headers, "Vary": SNAPSHOT_VARY}
+    if accept_encoding and "gzip" in accept_encoding.lower():
+        headers["Content-Encoding"] = "gzip"
+        if "ETag" in headers:
+            headers["ETag"] = gzip_etag(headers["ETag"])
+        return Response(snapshot.body, media_type=snapshot.media_type, headers=headers)
+    return Response(gzip.decompress(snapshot.body), media_type=snapshot.media_type, headers=headers)
+
+
+vault_snapshot_cache = SnapshotCache(settings.VAULT_SNAPSHOT_CACHE_MAX_BYTES, settings.VAULT_SNAPSHOT_COMPRESS_LEVEL)
+register_stats("vault_snapshot_cache", vault_snapshot_cache.stats)
@@ -0,0 +1,69 @@
+from typing import Iterable, Optional
+from sqlalchemy import delete, lambda_stmt, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.vault_tag import VaultTag
+
+
+def normalize_tags(tags: Optional[Iterable[str]]) -> dict[str, str]:
+    """Maps each distinct lowercased tag to its display form (first occurrence wins)."""
+    normalized: dict[str, str] = {}
+    for tag in tags or ():
+        if tag:
+            normalized.setdefault(tag.lower(), tag)
+    return normalized
+
+
+def tag_delta(old_tags: Optional[Iterable[str]], new_tags: Optional[Iterable[str]]) -> dict[str, tuple[str, int]]:
+    """Count changes caused by replacing ``old_tags`` with ``new_tags`` on one record."""
+    old = normalize_tags(old_tags)
+    new = normalize_tags(new_tags)
+
+    delta = {tag: (display, 1) for tag, display in new.items() if tag not in old}
+    delta.update({tag: (display, -1) for tag, display in old.items() if tag not in new})
+    return delta
+
+
+def merge_tag_deltas(total: dict[str, tuple[str, int]], delta: dict[str, tuple[str, int]]) -> None:
+    """Accumulates ``delta`` into ``total`` (for multi-record writes)."""
+    for tag, (display, change) in delta.items():
+        current_display, current = total.get(tag, (display, 0))
+        total[tag] = (current_display, current + change)
+
+
+async def apply_tag_delta(session: AsyncSession, user_id: str, delta: dict[str, tuple[str, int]]) -> None:
+    """Applies count changes to the user's tag index.
+
+    Runs in the caller's transaction (no commit), so the index always moves
+    together with the vault rows.
+    """
+    changes = [
+        {"user_id": user_id, "tag": tag, "display": display, "count": change}
+        for tag, (display, change) in sorted(delta.items())
+        if change
+    ]
+    if not changes:
+        return
+
+    stmt = insert(VaultTag).values(changes)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[VaultTag.user_id, VaultTag.tag],
+        set_={"count": VaultTag.count + stmt.excluded.count},
+    )
+    await session.execute(stmt)
+
+    if any(change["count"] < 0 for change in changes):
+        await session.execute(
+            delete(VaultTag).where(VaultTag.user_id == user_id, VaultTag.count <= 0)
+        )
+
+
+async def get_tag_counts(session: AsyncSession, user_id: str) -> list[tuple[str, int]]:
+    """Retrieves (display tag, record count) for every tag the user has."""
+    result = await session.execute(lambda_stmt(lambda: (
+        select(VaultTag.display, VaultTag.count)
+        .where(VaultTag.user_id == user_id)
+        .order_by(VaultTag.tag)
+    )))
+    return [tuple(row) for row in result.all()]
@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.token import RevokedToken
+
+
+async def revoke_token(session: AsyncSession, jti: str, user_id: Optional[str], expires_at: datetime) -> bool:
+    """Adds a token to the revocation list (idempotent).
+
+    Returns False if the token was already revoked: of concurrent callers,
+    exactly one gets True.
+    """
+    stmt = insert(RevokedToken).values(
+        jti=jti,
+        user_id=user_id,
+        expires_at=expires_at,
+        revoked_at=datetime.now(),
+    ).on_conflict_do_nothing(index_elements=[RevokedToken.jti]).returning(RevokedToken.jti)
+
+    result = await session.execute(stmt)
+    inserted = result.scalar_one_or_none() is not None
+    await session.commit()
+    return inserted
+
+
+async def is_token_revoked(session: AsyncSession, jti: str) -> bool:
+    """Exact revocation check, used when the Bloom filter reports a possible hit."""
+    result = await session.execute(select(RevokedToken.jti).where(RevokedToken.jti == jti))
+    return result.scalar_one_or_none() is not None
+
+
+async def get_active_revoked_jtis(session: AsyncSession) -> list[str]:
+    """Retrieves the jti of every revoked token that has not expired yet."""
+    result = await session.execute(
+        select(RevokedToken.jti).where(RevokedToken.expires_at > datetime.now())
+    )
+    return result.scalars().all()
+
+
+# pg advisory lock key for the purge below ("revoked" in ASCII)
+REVOCATION_PURGE_LOCK_KEY = 0x7265766F6B6564
+
+
+async def delete_expired_revocations(session: AsyncSession) -> int:
+    """Drops revocations for tokens that are past their exp.
+
+    Every worker process schedules the purge; a transaction-level advisory
+    lock lets one of them run it and the others skip it (returning 0).
+    """
+    locked = await session.scalar(select(func.pg_try_advisory_xact_lock(REVOCATION_PURGE_LOCK_KEY)))
+    if not locked:
+        await session.rollback()
+        return 0
+
+    result = await session.execute(
+        delete(RevokedToken).where(RevokedToken.expires_at <= datetime.now())
+    )
+    await session.commit()
+    return result.rowcount
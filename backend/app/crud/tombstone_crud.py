@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.vault_tombstone import VaultTombstone
+
+
+async def add_tombstones(session: AsyncSession, user_id: str, vault_ids: Iterable[str]) -> None:
+    """Records deleted vault ids; runs in the caller's transaction (no commit)."""
+    now = datetime.now()
+    rows = [{"id": vault_id, "user_id": user_id, "deleted_at": now} for vault_id in vault_ids]
+    if not rows:
+        return
+
+    stmt = insert(VaultTombstone).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[VaultTombstone.user_id, VaultTombstone.id],
+        set_={"deleted_at": stmt.excluded.deleted_at},
+    )
+    await session.execute(stmt)
+
+
+async def get_tombstones_since(session: AsyncSession, user_id: str, since: Optional[datetime]) -> list[str]:
+    """Retrieves the ids of the user's records deleted after ``since`` (all kept ones if None)."""
+    stmt = select(VaultTombstone.id).where(VaultTombstone.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(VaultTombstone.deleted_at > since)
+
+    result = await session.execute(stmt.order_by(VaultTombstone.deleted_at))
+    return result.scalars().all()
+
+
+async def delete_expired_tombstones(session: AsyncSession, before: datetime) -> int:
+    """Drops tombstones older than the retention window."""
+    result = await session.execute(
+        delete(VaultTombstone).where(VaultTombstone.deleted_at < before)
+    )
+    await session.commit()
+    return result.rowcount
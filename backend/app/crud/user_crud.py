@@ -1,7 +1,12 @@
-from sqlalchemy import select
+from datetime import datetime
+from sqlalchemy import bindparam, delete, lambda_stmt, select, update
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.principal_cache import principal_cache
+from ..database.routing import recent_writes
 from ..models.user import User
+from ..models.vault import Vault
+from ..models.vault_tombstone import VaultTombstone
 from ..schemas.user import UserInfo, UserPublic, UserRegister
 
 # --- CREATE ---
@@ -27,13 +32,22 @@ async def create_user(session: AsyncSession, user_data: UserRegister) -> User:
 
 
 async def get_user_by_id(session: AsyncSession, user_id: int) -> Optional[User]:
-    """Retrieves a user by their primary ID."""
-    return await session.get(User, user_id)
+    """Retrieves a user by their primary ID; deleted accounts are not returned."""
+    user = await session.get(User, user_id)
+    if user is None or user.deleted_at is not None:
+        return None
+    return user
+
 
+async def get_user_by_email(session: AsyncSession, email: str, include_deleted: bool = False) -> Optional[User]:
+    """Retrieves a user by their email (used for login/uniqueness checks).
 
-async def get_user_by_email(session: AsyncSession, email: str) -> Optional[User]:
-    """Retrieves a user by their email (used for login/uniqueness checks)."""
-    statement = select(User).where(User.email == email)
+    ``include_deleted`` also matches accounts still waiting to be purged,
+    whose email stays taken until then.
+    """
+    statement = lambda_stmt(lambda: select(User).where(User.email == email))
+    if not include_deleted:
+        statement += lambda s: s.where(User.deleted_at.is_(None))
     result = await session.execute(statement)
     return result.scalars().first()
 
@@ -47,6 +61,8 @@ async def update_user_email(session: AsyncSession, user_id: int, new_email: str)
         user.email = new_email
 
         await session.commit()
+        principal_cache.invalidate_user(user_id)
+        recent_writes.mark(user_id)
         await session.refresh(user)
 
     return user
@@ -55,13 +71,72 @@ async def update_user_email(session: AsyncSession, user_id: int, new_email: str)
 
 
 async def delete_user(session: AsyncSession, user_id: int) -> bool:
-    """Deletes a user record."""
-    user = await session.get(User, user_id)
-    if user:
-        await session.delete(user)
-        await session.commit()
-        return True
-    return False
+    """Marks a user as deleted in one UPDATE and commits.
+
+    The account stops authenticating straight away; its rows are removed
+    later, in chunks, by ``purge_deleted_user``.
+    """
+    result = await session.execute(
+        update(User)
+        .where(User.id == user_id, User.deleted_at.is_(None))
+        .values(deleted_at=datetime.now())
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    deleted = result.scalar_one_or_none() is not None
+    await session.commit()
+    if deleted:
+        principal_cache.invalidate_user(user_id)
+        recent_writes.mark(user_id)
+    return deleted
+
+
+async def get_deleted_user_ids(session: AsyncSession, limit: int) -> list[str]:
+    """Retrieves the ids of users marked as deleted and not purged yet, oldest first."""
+    result = await session.execute(
+        select(User.id)
+        .where(User.deleted_at.is_not(None))
+        .order_by(User.deleted_at)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+async def _delete_chunk(session: AsyncSession, model, user_id: str, chunk_size: int) -> int:
+    # SKIP LOCKED: another worker purging the same account takes other rows
+    ids = (
+        select(model.id)
+        .where(model.user_id == user_id)
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        # user_id again: vault_tombstones ids are only unique per user
+        delete(model).where(model.user_id == user_id, model.id.in_(ids)).execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def purge_deleted_user(session: AsyncSession, user_id: str, chunk_size: int) -> int:
+    """Removes a deleted user's vault records and tombstones, ``chunk_size`` rows
+    per transaction, then the user row itself (its tag counts go with it through
+    ON DELETE CASCADE). Returns the number of vault records removed.
+    """
+    removed = 0
+    while (count := await _delete_chunk(session, Vault, user_id, chunk_size)):
+        removed += count
+    while await _delete_chunk(session, VaultTombstone, user_id, chunk_size):
+        pass
+
+    await session.execute(
+        delete(User)
+        .where(User.id == user_id, User.deleted_at.is_not(None))
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return removed
 
 
 async def update_user_profile(session: AsyncSession, user_info: UserPublic) -> Optional[User]:
@@ -73,6 +148,8 @@ async def update_user_profile(session: AsyncSession, user_info: UserPublic) -> O
         user.two_fa_enabled = user_info.two_fa_enabled
 
         await session.commit()
+        principal_cache.invalidate_user(user.id)
+        recent_writes.mark(user.id)
         await session.refresh(user)
 
     return user
@@ -90,6 +167,51 @@ async def update_user(session: AsyncSession, user: User) -> Optional[User]:
         existing_user.two_fa_enabled = user.two_fa_enabled
 
         await session.commit()
+        principal_cache.invalidate_user(existing_user.id)
+        recent_writes.mark(existing_user.id)
         await session.refresh(existing_user)
 
-    return existing_user
\ No newline at end of file
+    return existing_user
+
+async def update_last_login_batch(session: AsyncSession, last_logins: dict[str, datetime]) -> None:
+    """Sets last_login_at for many users in one batched UPDATE.
+
+    A Core executemany rather than an ORM bulk update by primary key: the
+    latter raises StaleDataError when a one-row batch matches no row (the
+    user was purged meanwhile), and the batch would be retried forever.
+    """
+    users = User.__table__
+    await session.execute(
+        update(users).where(users.c.id == bindparam("uid")).values(last_login_at=bindparam("ts")),
+        [{"uid": user_id, "ts": at} for user_id, at in last_logins.items()],
+    )
+    await session.commit()
+
+
+async def bump_vault_version(session: AsyncSession, user_id: str) -> int:
+    """Increments the user's vault version; runs in the caller's transaction (no commit)."""
+    result = await session.execute(
+        update(User)
+        .where(User.id == user_id)
+        # updated_at is assigned to itself so that its onupdate does not fire:
+        # a vault write is not a profile change
+        .values(vault_version=User.vault_version + 1, updated_at=User.updated_at)
+        .returning(User.vault_version)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one()
+
+
+async def get_write_marker(session: AsyncSession, user_id: str) -> Optional[tuple]:
+    """Reads (vault_version, updated_at): every vault write bumps the former, every profile write the latter."""
+    result = await session.execute(lambda_stmt(lambda: (
+        select(User.vault_version, User.updated_at).where(User.id == user_id)
+    )))
+    row = result.first()
+    return tuple(row) if row is not None else None
+
+async def get_vault_version(session: AsyncSession, user_id: str) -> Optional[int]:
+    """Reads the user's vault version (a primary key lookup on users)."""
+    # runs before every vault read (ETag); a lambda statement skips rebuilding it
+    result = await session.execute(lambda_stmt(lambda: select(User.vault_version).where(User.id == user_id)))
+    return result.scalar_one_or_none()
@@ -1,9 +1,17 @@
-from typing import Optional
-from sqlalchemy import func, select
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional, Sequence
+import uuid
+from sqlalchemy import Row, delete, exists, func, insert, lambda_stmt, literal, select, true, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..core.snapshot_cache import vault_snapshot_cache
+from ..database.routing import recent_writes
+from ..models.user import User
 from ..models.vault import Vault
+from ..models.vault_tombstone import VaultTombstone
+from .tag_crud import apply_tag_delta, get_tag_counts, merge_tag_deltas, normalize_tags, tag_delta
 
 from ..schemas.vault import VaultInfo, VaultRecordRequest
 
@@ -11,114 +19,372 @@ async def get_vault_by_id(session: AsyncSession, vault_id: int) -> Optional[Vaul
     """Retrieves a vault by its primary ID."""
     return await session.get(Vault, vault_id)
 
-async def create_update_vault(session: AsyncSession, vault_data: VaultRecordRequest) -> Vault:
-    """Creates or updates a vault record in the database."""
+# columns returned by writes; enough to build a VaultRecord without a re-select
+VAULT_RECORD_COLUMNS = (
+    Vault.id, Vault.user_id, Vault.title, Vault.login_id, Vault.notes, Vault.password_ciphertext,
+    Vault.encryption_iv, Vault.tags, Vault.created_at, Vault.updated_at,
+)
 
-    # Handle both create and update
+async def _lock_owner(session: AsyncSession, owner: str) -> None:
+    """Serializes the owner's vault writes until the caller's transaction ends.
+
+    Each write statement computes tag count deltas from the previous tags
+    it reads; without this, two concurrent writes of one record (or a write
+    racing a delete or a create of the same id) could compute them from the
+    same old row and leave vault_tags off for good. Locking the owner's row
+    -- which every write updates anyway to bump vault_version -- covers ids
+    that do not exist yet as well, and the next statement reads the rows as
+    the previous writer committed them.
+    """
+    await session.execute(select(User.id).where(User.id == owner).with_for_update())
+
+def _bump_version_cte(owner: str, written):
+    return (
+        update(User)
+        .where(User.id == owner, written)
+        .values(vault_version=User.vault_version + 1, updated_at=User.updated_at)
+        .returning(User.vault_version)
+        .cte("bumped")
+    )
+
+async def upsert_vaults(session: AsyncSession, owner: str, records: list[tuple[str, Any]],
+                        new_ids: bool = False) -> list[Row]:
+    """Creates or updates many of the owner's records in one statement; no commit.
+
+    ``records`` pairs each vault id with a record carrying the VaultRecordRequest
+    fields. INSERT ... ON CONFLICT (id) DO UPDATE ... WHERE user_id = owner
+    leaves rows owned by someone else alone (they are simply not returned),
+    and tags are only replaced when a record carries them. The vault version
+    bump and the cleanup of tombstones for client-chosen ids run as CTEs of
+    the same statement, which also returns each row's previous tags
+    (``old_tags``) to maintain the tag index.
+
+    ``new_ids`` tells that every id was just generated by the server: no
+    other transaction can write those rows, so the owner lock is skipped.
+    """
+    if not records:
+        return []
+
+    if not new_ids:
+        await _lock_owner(session, owner)
+
+    now = datetime.now()
+    ids = [vault_id for vault_id, _ in records]
+
+    # every CTE sees the snapshot taken at statement start, so these are the
+    # rows as they were before the upsert (and, with the owner locked, after
+    # any concurrent write to them)
+    old = (
+        select(Vault.id, Vault.tags)
+        .where(Vault.id.in_(ids), Vault.user_id == owner)
+        .cte("old")
+    )
+
+    insert_stmt = pg_insert(Vault).values([
+        {
+            "id": vault_id,
+            "user_id": owner,
+            "title": record.title,
+            "login_id": record.login_id,
+            "notes": record.notes,
+            "password_ciphertext": record.password_ciphertext,
+            "encryption_iv": record.encryption_iv,
+            "tags": record.tags,
+            "tags_normalized": list(normalize_tags(record.tags)) if record.tags is not None else None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for vault_id, record in records
+    ])
+    excluded = insert_stmt.excluded
+    upserted = (
+        insert_stmt.on_conflict_do_update(
+            index_elements=[Vault.id],
+            set_={
+                "title": excluded.title,
+                "login_id": excluded.login_id,
+                "notes": excluded.notes,
+                "password_ciphertext": excluded.password_ciphertext,
+                "encryption_iv": excluded.encryption_iv,
+                "updated_at": excluded.updated_at,
+                # NULL tags in the request mean "leave the tags as they are"
+                "tags": func.coalesce(excluded.tags, Vault.tags),
+                "tags_normalized": func.coalesce(excluded.tags_normalized, Vault.tags_normalized),
+            },
+            where=Vault.user_id == owner,
+        )
+        .returning(*VAULT_RECORD_COLUMNS)
+        .cte("upserted")
+    )
+    written = exists(select(upserted.c.id))
+
+    untombstoned = (
+        delete(VaultTombstone)
+        .where(VaultTombstone.user_id == owner, VaultTombstone.id.in_(ids), written)
+        .returning(VaultTombstone.id)
+        .cte("untombstoned")
+    )
+
+    stmt = (
+        select(upserted, old.c.tags.label("old_tags"))
+        .select_from(upserted.outerjoin(old, old.c.id == upserted.c.id))
+        .add_cte(_bump_version_cte(owner, written), untombstoned)
+    )
+    rows = (await session.execute(stmt)).all()
+
+    tags_by_id = {vault_id: record.tags for vault_id, record in records}
+    changes: dict[str, tuple[str, int]] = {}
+    for row in rows:
+        if tags_by_id[row.id] is not None:
+            merge_tag_deltas(changes, tag_delta(row.old_tags, tags_by_id[row.id]))
+    await apply_tag_delta(session, owner, changes)
+
+    return rows
+
+async def update_vault(session: AsyncSession, owner: str, vault_id: str, record: Any) -> Optional[Row]:
+    """Updates one of the owner's existing records in one statement; no commit.
+
+    UPDATE vaults ... FROM (SELECT ... WHERE id = :id AND user_id = :owner
+    FOR UPDATE) RETURNING: an unknown id, or one owned by someone else,
+    returns None. The vault version bump is a CTE that the locking select
+    waits on, so the users row is locked before the vault row, in the same
+    order as upsert_vaults and delete_vaults; the select returns the row as
+    any concurrent writer committed it, so ``old_tags`` is never stale. The
+    bump also happens when nothing matches: the caller rolls back then.
+    """
+    bumped = _bump_version_cte(owner, true())
+    old = (
+        select(Vault.id, Vault.tags)
+        .where(Vault.id == vault_id, Vault.user_id == owner, exists(select(bumped.c.vault_version)))
+        .with_for_update(of=Vault)
+        .cte("old")
+    )
+
+    values = {
+        "title": record.title,
+        "login_id": record.login_id,
+        "notes": record.notes,
+        "password_ciphertext": record.password_ciphertext,
+        "encryption_iv": record.encryption_iv,
+        "updated_at": datetime.now(),
+    }
+    if record.tags is not None:
+        # no tags in the request mean "leave the tags as they are"
+        values["tags"] = record.tags
+        values["tags_normalized"] = list(normalize_tags(record.tags))
+
+    stmt = (
+        update(Vault)
+        .where(Vault.id == old.c.id)
+        .values(values)
+        .returning(*VAULT_RECORD_COLUMNS, old.c.tags.label("old_tags"))
+        .add_cte(bumped)
+    )
+    row = (await session.execute(stmt)).first()
+    if row is None:
+        return None
+
+    if record.tags is not None:
+        await apply_tag_delta(session, owner, tag_delta(row.old_tags, record.tags))
+    return row
+
+async def delete_vaults(session: AsyncSession, owner: str, vault_ids: list[str]) -> list[str]:
+    """Deletes the owner's records among ``vault_ids`` in one statement; no commit.
+
+    Tombstones and the vault version bump are written by CTEs of the same
+    DELETE ... RETURNING. Returns the ids actually deleted.
+    """
+    if not vault_ids:
+        return []
+
+    await _lock_owner(session, owner)
+
+    deleted = (
+        delete(Vault)
+        .where(Vault.user_id == owner, Vault.id.in_(vault_ids))
+        .returning(Vault.id, Vault.tags)
+        .cte("deleted")
+    )
+    written = exists(select(deleted.c.id))
+
+    tombstone_stmt = pg_insert(VaultTombstone).from_select(
+        ["id", "user_id", "deleted_at"],
+        select(deleted.c.id, literal(owner), literal(datetime.now())),
+    )
+    tombstoned = (
+        tombstone_stmt.on_conflict_do_update(
+            index_elements=[VaultTombstone.user_id, VaultTombstone.id],
+            set_={"deleted_at": tombstone_stmt.excluded.deleted_at},
+        )
+        .returning(VaultTombstone.id)
+        .cte("tombstoned")
+    )
+
+    stmt = select(deleted).add_cte(tombstoned, _bump_version_cte(owner, written))
+    rows = (await session.execute(stmt)).all()
+
+    changes: dict[str, tuple[str, int]] = {}
+    for row in rows:
+        merge_tag_deltas(changes, tag_delta(row.tags, None))
+    await apply_tag_delta(session, owner, changes)
+
+    return [row.id for row in rows]
+
+async def create_update_vault(session: AsyncSession, vault_data: VaultRecordRequest) -> Optional[Row]:
+    """Creates or updates a vault record in one statement and commits.
+
+    Without an id the record is created under a new server-generated id;
+    with one, only an existing record of the user is updated. Returns the
+    written row (VAULT_RECORD_COLUMNS), or None when the id is unknown or
+    belongs to another user.
+    """
     if vault_data.id:
-        # Update existing record
-        db_vault = await session.get(Vault, vault_data.id)
-        if not db_vault:
-            raise ValueError("Vault record not found for update.")
-        
-        # Update fields (don't update user_id as it shouldn't change)
-        db_vault.title = vault_data.title
-        db_vault.login_id = vault_data.login_id
-        db_vault.notes = vault_data.notes
-        db_vault.password_ciphertext = vault_data.password_ciphertext
-
-        db_vault.encryption_iv = vault_data.encryption_iv
-        # db_vault.login_id_ciphertext = vault_data.login_id_ciphertext
-        
-        # Handle tags if provided
-        if vault_data.tags is not None:
-            db_vault.tags = vault_data.tags
+        row = await update_vault(session, vault_data.user_id, vault_data.id, vault_data)
     else:
-        # Create new record
-        db_vault = Vault(
-            user_id=vault_data.user_id,
-            title=vault_data.title,
-            login_id=vault_data.login_id,
-            notes=vault_data.notes,
-            password_ciphertext=vault_data.password_ciphertext,
-            encryption_iv=vault_data.encryption_iv,
-            # login_id_ciphertext=vault_data.login_id_ciphertext,
-            tags=vault_data.tags  # Will be None if not provided
-        )
+        rows = await upsert_vaults(session, vault_data.user_id, [(str(uuid.uuid4()), vault_data)], new_ids=True)
+        row = rows[0] if rows else None
+    if row is None:
+        await session.rollback()
+        return None
 
-    session.add(db_vault)
     await session.commit()
-    await session.refresh(db_vault, attribute_names=['user'])
-
-    stmt = select(Vault).options(selectinload(Vault.user)).where(Vault.id == db_vault.id)
-    vault_with_user = await session.execute(stmt)
+    vault_snapshot_cache.invalidate_user(vault_data.user_id)
+    recent_writes.mark(vault_data.user_id)
+    return row
 
-    vault_with_user = vault_with_user.scalar_one()
+async def stream_vaults_by_user_id(session: AsyncSession, user_id: str, batch_size: int) -> AsyncIterator[Sequence[Row]]:
+    """Yields a user's vault rows (column tuples, no ORM objects) in batches from a server-side cursor."""
+    stmt = (
+        select(
+            Vault.id, Vault.title, Vault.login_id, Vault.notes, Vault.password_ciphertext,
+            Vault.encryption_iv, Vault.tags, Vault.created_at, Vault.updated_at,
+        )
+        .where(Vault.user_id == user_id)
+        .order_by(Vault.created_at, Vault.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await session.stream(stmt)
+    async for partition in result.partitions():
+        yield partition
 
-    return vault_with_user
+async def insert_vaults(session: AsyncSession, rows: list[dict]) -> None:
+    """Inserts vault rows with one executemany; runs in the caller's transaction (no commit)."""
+    if rows:
+        await session.execute(insert(Vault), rows)
 
 async def get_vault_by_id(session: AsyncSession, vault_id: int) -> Optional[Vault]:
     """Retrieves a vault by its primary ID, including the related user."""
     result = await session.execute(
-        select(Vault).where(Vault.id == vault_id).options(selectinload(Vault.user))
+        lambda_stmt(lambda: select(Vault).where(Vault.id == vault_id).options(selectinload(Vault.user)))
     )
     return result.scalar_one_or_none()
 
-async def get_vaults_by_user_id(session: AsyncSession, user_id: str) -> list[Vault]:
-    """Retrieves all vaults for a given user ID ordered by creation date descending."""
-    result = await session.execute(
-        select(Vault).where(Vault.user_id == user_id).options(selectinload(Vault.user)).order_by(Vault.created_at.desc())
-    )
+async def get_vaults_by_user_id(
+        session: AsyncSession,
+        user_id: str,
+        limit: Optional[int] = None,
+        after: Optional[tuple[datetime, str]] = None,
+        with_owner: bool = True,
+    ) -> list[Vault]:
+    """Retrieves vaults for a given user ID ordered by creation date descending.
+
+    Pages with a keyset on (created_at, id): ``after`` is the last row of the
+    previous page. Served by ix_vaults_user_id_created_at.
+    """
+    # lambda statements: each variant is built and compiled once, later calls
+    # only extract the bound values (see benchmarks/hot_query_overhead.py)
+    stmt = lambda_stmt(lambda: (
+        select(Vault)
+        .where(Vault.user_id == user_id)
+        .order_by(Vault.created_at.desc(), Vault.id.desc())
+    ))
+    if with_owner:
+        stmt += lambda s: s.options(selectinload(Vault.user))
+    if after is not None:
+        after_created_at, after_id = after
+        stmt += lambda s: s.where(tuple_(Vault.created_at, Vault.id) < tuple_(after_created_at, after_id))
+    if limit is not None:
+        stmt += lambda s: s.limit(limit)
+
+    result = await session.execute(stmt)
     return result.scalars().all()
 
-async def delete_vault_by_id(session: AsyncSession, vault_id: int) -> bool:
-    """Deletes a vault by its primary ID."""
-    db_vault = await session.get(Vault, vault_id)
-    if not db_vault:
+async def delete_vault_by_id(session: AsyncSession, user_id: str, vault_id: str) -> bool:
+    """Deletes one of the user's vaults by its primary ID in a single statement and commits."""
+    if not await delete_vaults(session, user_id, [vault_id]):
+        await session.rollback()
         return False
 
-    await session.delete(db_vault)
     await session.commit()
+    vault_snapshot_cache.invalidate_user(user_id)
+    recent_writes.mark(user_id)
     return True
 
-async def get_vaults_by_tag(session: AsyncSession, user_id: str, tag: str) -> list[Vault]:
+async def get_vaults_changed_since(session: AsyncSession, user_id: str, since: datetime) -> list[Vault]:
+    """Retrieves the user's vault records created or updated after ``since`` (without the owner)."""
+    result = await session.execute(lambda_stmt(lambda: (
+        select(Vault)
+        .where(Vault.user_id == user_id, Vault.updated_at > since)
+        .order_by(Vault.updated_at, Vault.id)
+    )))
+    return result.scalars().all()
+
+async def get_vaults_by_tag(session: AsyncSession, user_id: str, tag: str, with_owner: bool = True) -> list[Vault]:
     """Retrieves all vaults for a given user ID that contain a specific tag."""
-    result = await session.execute(
+    tags = [tag.lower()]
+    stmt = lambda_stmt(lambda: (
         select(Vault)
         .where(Vault.user_id == user_id)
-        .where(func.lower(func.array_to_string(Vault.tags, ',')).contains(func.lower(tag)))
-        .options(selectinload(Vault.user))
-    )
+        .where(Vault.tags_normalized.contains(tags))
+    ))
+    if with_owner:
+        stmt += lambda s: s.options(selectinload(Vault.user))
+
+    result = await session.execute(stmt)
     return result.scalars().all()
 
-async def search_vaults(session: AsyncSession, user_id: str, query: str | None, tag: str | None) -> list[Vault]:
-    """Searches vaults for a given user ID by title or notes."""
-    lower_query = f"%{query.lower()}%" if query else None
+def _escape_like(value: str) -> str:
+    # "/" rather than backslash: no ambiguity with standard_conforming_strings
+    return value.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+async def search_vaults(session: AsyncSession, user_id: str, query: str | None, tag: str | None,
+                        with_owner: bool = True, limit: Optional[int] = None) -> list[Vault]:
+    """Searches vaults for a given user ID by title or notes.
+
+    The substring match on lower(title)/lower(notes) is served by the pg_trgm
+    GIN indexes; matches are ranked by trigram similarity to the query.
+    """
+    lower_query = query.lower() if query else None
     lower_tag = tag.lower() if tag else None
 
-    stmt = select(Vault).where(Vault.user_id == user_id).options(selectinload(Vault.user))
+    stmt = lambda_stmt(lambda: select(Vault).where(Vault.user_id == user_id))
+    if with_owner:
+        stmt += lambda s: s.options(selectinload(Vault.user))
 
     if lower_query:
-        stmt = stmt.where((func.lower(Vault.title).like(lower_query)) | (func.lower(Vault.notes).like(lower_query)))
+        pattern = f"%{_escape_like(lower_query)}%"
+        stmt += lambda s: s.where(
+            func.lower(Vault.title).like(pattern, escape="/") | func.lower(Vault.notes).like(pattern, escape="/")
+        ).order_by(
+            func.greatest(
+                func.similarity(func.lower(Vault.title), lower_query),
+                func.similarity(func.lower(Vault.notes), lower_query),
+            ).desc(),
+            Vault.created_at.desc(),
+        )
+    else:
+        stmt += lambda s: s.order_by(Vault.created_at.desc(), Vault.id.desc())
 
     if lower_tag:
-        stmt = stmt.where(func.lower(func.array_to_string(Vault.tags, ',')).contains(lower_tag))
+        tags = [lower_tag]
+        stmt += lambda s: s.where(Vault.tags_normalized.contains(tags))
+
+    if limit is not None:
+        stmt += lambda s: s.limit(limit)
 
     result = await session.execute(stmt)
     return result.scalars().all()
 
-async def get_unique_tags(session: AsyncSession, user_id: str) -> list[str]:
-    """Retrieves a list of unique tags for a given user ID."""
-    result = await session.execute(
-        select(Vault.tags).where(Vault.user_id == user_id)
-    )
-    tags_lists = result.scalars().all()
-    
-    unique_tags = {}
-    for tags in tags_lists:
-        if tags:
-            for tag in tags:
-                lower_tag = tag.lower()
-                unique_tags.setdefault(lower_tag, tag)  # Preserve first occurrence's case
-    
-    return list(unique_tags.values())
\ No newline at end of file
+async def get_unique_tags(session: AsyncSession, user_id: str) -> list[tuple[str, int]]:
+    """Retrieves each unique tag (display form) for a given user ID with its record count."""
+    return await get_tag_counts(session, user_id)
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+PRE_PING_STRATEGIES = ("always", "idle", "never")
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that counts checkouts, time spent waiting for them and pool timeouts."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.checkout_seconds = 0.0
+        self.checkout_max_seconds = 0.0
+
+    def connect(self):
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+            elapsed = time.perf_counter() - start
+            self.checkout_seconds += elapsed
+            self.checkout_max_seconds = max(self.checkout_max_seconds, elapsed)
+        self.checkouts += 1
+        return connection
+
+    def stats(self) -> dict:
+        attempts = self.checkouts + self.timeouts
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "waiting": self.waiting,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            # averaged over every attempt, timed out ones included
+            "checkout_avg_ms": round(self.checkout_seconds * 1000 / attempts, 3) if attempts else 0.0,
+            "checkout_max_ms": round(self.checkout_max_seconds * 1000, 3),
+        }
+
+
+def install_idle_pre_ping(engine: AsyncEngine, idle_seconds: int) -> None:
+    """Pings a connection on checkout only if it sat idle in the pool for ``idle_seconds``.
+
+    Connections in steady use skip the extra round trip that ``pool_pre_ping``
+    pays on every checkout; a failed ping discards the connection and the pool
+    retries with a fresh one.
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        try:
+            alive = sync_engine.dialect.do_ping(dbapi_connection)
+        except Exception:
+            alive = False
+        if not alive:
+            raise exc.DisconnectionError("Connection failed idle pre-ping")
+
+
+async def prewarm_pool(engine: AsyncEngine, connections: int) -> int:
+    """Opens ``connections`` connections at once and returns them to the pool; returns how many opened."""
+    async def _open():
+        return await engine.connect()
+
+    results = await asyncio.gather(*(_open() for _ in range(connections)), return_exceptions=True)
+    opened = [conn for conn in results if not isinstance(conn, BaseException)]
+    for conn in opened:
+        await conn.close()
+
+    failures = [error for error in results if isinstance(error, BaseException)]
+    if failures:
+        logger.warning("Pre-warmed %d of %d database connections: %s", len(opened), connections, failures[0])
+    return len(opened)
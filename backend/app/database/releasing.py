@@ -0,0 +1,61 @@
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.metrics import register_stats
+
+_stats = {"released": 0}
+
+
+class ReleasingSession(AsyncSession):
+    """Request session that holds a pool connection only while it is querying.
+
+    Like any AsyncSession it checks a connection out on its first statement;
+    unlike one, it ends the (read-only) transaction as soon as a query
+    returns, so the connection goes back to the pool while the handler runs
+    OPAQUE work or serializes the response, instead of at teardown. Results
+    are buffered and objects are not expired (expire_on_commit=False), so
+    nothing read is lost. Once the session writes -- DML, a FOR UPDATE
+    select or an ORM flush -- it keeps its transaction until the caller
+    commits or rolls back, as before.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._writing = False
+        event.listen(self.sync_session, "after_flush", self._mark_writing)
+        event.listen(self.sync_session, "after_transaction_end", self._transaction_ended)
+
+    def _mark_writing(self, *args) -> None:
+        self._writing = True
+
+    def _transaction_ended(self, session, transaction) -> None:
+        if transaction.parent is None:
+            self._writing = False
+
+    async def _release(self) -> None:
+        if self._writing or not self.in_transaction() or self.in_nested_transaction():
+            return
+        if self.new or self.dirty or self.deleted:
+            return
+        # nothing to flush: COMMIT just ends the snapshot and returns the connection
+        await self.commit()
+        _stats["released"] += 1
+
+    async def execute(self, statement, *args, **kwargs):
+        if not statement.is_select or getattr(statement, "_for_update_arg", None) is not None:
+            self._writing = True
+        result = await super().execute(statement, *args, **kwargs)
+        await self._release()
+        return result
+
+    async def scalar(self, statement, *args, **kwargs):
+        result = await self.execute(statement, *args, **kwargs)
+        return result.scalar()
+
+    async def get(self, *args, **kwargs):
+        instance = await super().get(*args, **kwargs)
+        await self._release()
+        return instance
+
+
+register_stats("db_sessions", lambda: dict(_stats))
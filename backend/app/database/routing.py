@@ -0,0 +1,107 @@
+from collections import OrderedDict
+import time
+from typing import Optional
+
+from ..core.config import settings
+from ..core.metrics import register_stats
+
+
+class _ExpiringUsers:
+    """User ids that each stay in for the same ``ttl`` seconds.
+
+    Kept in insertion order, the entries are also in expiry order: expired
+    ones are dropped from the front in amortized O(1) per add, and
+    ``max_users`` evicts the oldest entry first.
+    """
+
+    def __init__(self, ttl: float, max_users: int):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._until: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._until)
+
+    def add(self, user_id: str) -> None:
+        now = time.monotonic()
+        while self._until and next(iter(self._until.values())) <= now:
+            self._until.popitem(last=False)
+        self._until[user_id] = now + self.ttl
+        self._until.move_to_end(user_id)
+        while len(self._until) > self.max_users:
+            self._until.popitem(last=False)
+
+    def discard(self, user_id: str) -> None:
+        self._until.pop(user_id, None)
+
+    def __contains__(self, user_id: str) -> bool:
+        until = self._until.get(user_id)
+        if until is not None and until <= time.monotonic():
+            del self._until[user_id]
+            until = None
+        return until is not None
+
+
+class RecentWrites:
+    """Users who wrote in the last ``window`` seconds through this process.
+
+    Tracked per process, so it is only a shortcut: the worker that handled
+    a write sends that user's reads to the primary without asking the
+    replica. Other workers (and hosts) cannot see the mark and check that
+    the replica has caught up instead (see core.auth_filter.use_replica).
+    A positive check is remembered for ``check_ttl`` seconds, so a burst of
+    reads costs one comparison; a mark here forgets it at once.
+    """
+
+    def __init__(self, window: float, check_ttl: float = 0.0, max_users: int = 1024):
+        self.window = window
+        self._marked = _ExpiringUsers(window, max_users)
+        self._caught_up = _ExpiringUsers(check_ttl, max_users)
+        self.marks = 0
+        self.primary_reads = 0
+        self.replica_reads = 0
+        self.replica_behind = 0
+        self.cached_checks = 0
+
+    def mark(self, user_id: str) -> None:
+        self._marked.add(str(user_id))
+        self._caught_up.discard(str(user_id))
+        self.marks += 1
+
+    def active(self, user_id: str) -> bool:
+        return str(user_id) in self._marked
+
+    def caught_up(self, user_id: str) -> bool:
+        """Whether the replica was found caught up for the user within ``check_ttl``."""
+        if str(user_id) in self._caught_up:
+            self.cached_checks += 1
+            return True
+        return False
+
+    def routed(self, on_replica: bool, behind: bool = False, user_id: Optional[str] = None) -> None:
+        """Counts a routing decision; ``behind`` when the replica was found lagging.
+
+        With ``user_id``, a replica decision is remembered for ``check_ttl``.
+        """
+        if on_replica:
+            self.replica_reads += 1
+            if user_id is not None and self._caught_up.ttl > 0:
+                self._caught_up.add(str(user_id))
+        else:
+            self.primary_reads += 1
+        self.replica_behind += behind
+
+    def stats(self) -> dict:
+        return {
+            "tracked_users": len(self._marked),
+            "window_seconds": self.window,
+            "marks": self.marks,
+            "primary_reads": self.primary_reads,
+            "replica_reads": self.replica_reads,
+            "replica_behind": self.replica_behind,
+            "cached_checks": self.cached_checks,
+        }
+
+
+recent_writes = RecentWrites(settings.DB_READ_YOUR_WRITES_SECONDS, settings.DB_REPLICA_CHECK_CACHE_SECONDS)
+register_stats("read_your_writes", recent_writes.stats)
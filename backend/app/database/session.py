@@ -1,6 +1,10 @@
+from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from ..core import settings
+from ..core.metrics import register_stats
+from .pool import InstrumentedPool, install_idle_pre_ping
+from .releasing import ReleasingSession
 # Import the engine from the database setup file
 
 DATABASE_URL = (
@@ -13,12 +17,32 @@ DATABASE_URL = (
 # ---------------------------------------------------------------------
 # Create async engine & session factory
 # ---------------------------------------------------------------------
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,              # set True for SQL debug logs
-    future=True,             
-    pool_pre_ping=True,      # auto-check broken connections
-)
+def _create_engine(url: str):
+    engine = create_async_engine(
+        url,
+        echo=False,              # set True for SQL debug logs
+        future=True,             
+        poolclass=InstrumentedPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,      # fail fast instead of queueing requests
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING == "always",
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+        connect_args={"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE},
+    )
+    if settings.DB_POOL_PRE_PING == "idle":
+        install_idle_pre_ping(engine, settings.DB_POOL_PING_IDLE_SECONDS)
+    return engine
+
+
+engine = _create_engine(DATABASE_URL)
+register_stats("db_pool", engine.pool.stats)
+
+# Optional streaming replica for read-only requests (see get_read_db)
+replica_engine = _create_engine(settings.DB_REPLICA_DSN) if settings.DB_REPLICA_DSN else None
+if replica_engine is not None:
+    register_stats("db_replica_pool", replica_engine.pool.stats)
 
 # Async session
 AsyncSessionLocal = sessionmaker(
@@ -27,12 +51,44 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False,
 )
 
+ReplicaSessionLocal = sessionmaker(
+    bind=replica_engine or engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+
+# Request sessions give their connection back after each read (see ReleasingSession)
+RequestSessionLocal = sessionmaker(
+    bind=engine,
+    class_=ReleasingSession,
+    expire_on_commit=False,
+)
+
+ReplicaRequestSessionLocal = sessionmaker(
+    bind=replica_engine or engine,
+    class_=ReleasingSession,
+    expire_on_commit=False,
+)
+
 # ---------------------------------------------------------------------
 # Dependency for FastAPI routes
 # ---------------------------------------------------------------------
 async def get_db():
-    async with AsyncSessionLocal() as session:
+    async with RequestSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+async def get_replica_db(db: AsyncSession = Depends(get_db)):
+    """Session on the replica, or the request's primary session when no replica is configured."""
+    if replica_engine is None:
+        yield db
+        return
+
+    async with ReplicaRequestSessionLocal() as session:
         try:
             yield session
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
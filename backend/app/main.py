@@ -1,17 +1,55 @@
+import asyncio
+from contextlib import asynccontextmanager
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 # from fastapi.middleware.cors import CORSMiddleware
-from .api.v1 import user_router, auth_router, vault_router
+from .api.v1 import user_router, auth_router, vault_router, metrics_router
 from .core.config import settings, setup_logging
+from .core.crypto_executor import CryptoPoolBusy, crypto_executor
+from .core.revocation import run_revocation_purger, run_revocation_refresher
+from .database.pool import prewarm_pool
+from .database.session import AsyncSessionLocal, engine, replica_engine
+from .services.account_deletion_service import run_account_deletion_worker
+from .services.login_activity_service import run_login_activity_flusher
+from .services.vault_sync_service import run_tombstone_compactor
 
 # Configure logging to show DEBUG and above
 setup_logging(level_str=settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_POOL_PREWARM:
+        opened = await prewarm_pool(engine, settings.DB_POOL_SIZE)
+        logger.info("Database pool pre-warmed with %d connections", opened)
+        if replica_engine is not None:
+            opened = await prewarm_pool(replica_engine, settings.DB_POOL_SIZE)
+            logger.info("Replica pool pre-warmed with %d connections", opened)
+
+    background_tasks = [
+        asyncio.create_task(run_revocation_refresher(AsyncSessionLocal, settings.REVOCATION_REFRESH_SECONDS)),
+        asyncio.create_task(run_revocation_purger(AsyncSessionLocal, settings.REVOCATION_PURGE_SECONDS)),
+        asyncio.create_task(run_login_activity_flusher(AsyncSessionLocal, settings.LOGIN_ACTIVITY_FLUSH_SECONDS)),
+        asyncio.create_task(run_tombstone_compactor(AsyncSessionLocal, settings.VAULT_TOMBSTONE_COMPACT_SECONDS)),
+        asyncio.create_task(run_account_deletion_worker(AsyncSessionLocal, settings.ACCOUNT_DELETE_POLL_SECONDS)),
+    ]
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    crypto_executor.shutdown()
+
+
 app = FastAPI(
     title="VigiPastore Backend API",
     version=settings.APP_VERSION,
     description="Zero-Knowledge API for encrypted vault data.",
+    lifespan=lifespan,
 )
 
 # origins = [
@@ -28,10 +66,29 @@ app = FastAPI(
 #     allow_headers=["*"],
 # )
 
+@app.exception_handler(CryptoPoolBusy)
+async def crypto_pool_busy_handler(request: Request, exc: CryptoPoolBusy):
+    logger.warning("Rejecting %s: %s", request.url.path, exc)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Authentication service is busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(PoolTimeoutError)
+async def db_pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    logger.warning("Rejecting %s: database pool exhausted: %s", request.url.path, exc)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Service is busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
 @app.get("/", tags=["root"])
 async def root():
     return {"message": "Welcome to VigiPastore Backend"}
 
 app.include_router(user_router, prefix="/api/v1")
 app.include_router(auth_router, prefix="/api/v1") 
-app.include_router(vault_router, prefix="/api/v1")
\ No newline at end of file
+app.include_router(vault_router, prefix="/api/v1")
+app.include_router(metrics_router, prefix="/api/v1")
\ No newline at end of file
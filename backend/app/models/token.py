@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+from ..database import Base
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti: Mapped[str] = mapped_column(String(36), primary_key=True)
+
+    user_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True)
+
+    # the row is only needed until the token would have expired anyway
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True, nullable=False)
+
+    revoked_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False)
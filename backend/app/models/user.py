@@ -1,8 +1,7 @@
 from typing import Optional
 from datetime import datetime
 import uuid
-from sqlalchemy import String, Boolean, LargeBinary, DateTime
-from sqlalchemy.sql import func
+from sqlalchemy import BigInteger, String, Boolean, LargeBinary, DateTime
 from sqlalchemy.orm import Mapped, mapped_column
 from ..database import Base 
 
@@ -39,15 +38,25 @@ class User(Base):
         default=None
     )  # Hashed recovery codes for 2FA
 
+    # Bumped in the same transaction as every write to the user's vault
+    # records; read endpoints derive their ETag from it
+    vault_version: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
+
     # --- Metadata/Tracking Fields ---
     created_at: Mapped[datetime] = mapped_column(
-        DateTime, default=datetime.now(), nullable=False
+        DateTime, default=datetime.now, nullable=False
     )
 
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime, default=datetime.now(), nullable=True, onupdate=func.now()
+        DateTime, default=datetime.now, nullable=True, onupdate=datetime.now
     ) 
 
     last_login_at: Mapped[Optional[datetime]] = mapped_column(
         DateTime, default=None, nullable=True
+    )
+
+    # Set when the account is deleted; the row and its vault data are then
+    # purged in chunks by the account deletion worker
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime, default=None, nullable=True, index=True
     )
\ No newline at end of file
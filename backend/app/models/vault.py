@@ -2,7 +2,8 @@
 from datetime import datetime
 from typing import List, Optional
 import uuid
-from sqlalchemy import ARRAY, ForeignKey, Integer, LargeBinary, String, func, DateTime
+from sqlalchemy import ARRAY, ForeignKey, Index, Integer, LargeBinary, String, DateTime, text
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 
 from .user import User
@@ -11,10 +12,21 @@ from ..database import Base
 
 class Vault(Base):
     __tablename__ = "vaults"
+    __table_args__ = (
+        # serves the per-user listing and its keyset pagination on (created_at, id)
+        Index("ix_vaults_user_id_created_at", "user_id", "created_at", "id"),
+        # serves delta sync: records changed since a watermark
+        Index("ix_vaults_user_id_updated_at", "user_id", "updated_at"),
+        # pg_trgm indexes for substring search on the lowercased text columns
+        Index("ix_vaults_title_trgm", text("lower(title) gin_trgm_ops"), postgresql_using="gin"),
+        Index("ix_vaults_notes_trgm", text("lower(notes) gin_trgm_ops"), postgresql_using="gin"),
+        # exact tag lookups: tags_normalized @> ARRAY[:tag]
+        Index("ix_vaults_tags_normalized", "tags_normalized", postgresql_using="gin"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
 
-    user_id: Mapped[str] = mapped_column(ForeignKey('users.id'))  
+    user_id: Mapped[str] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'))  
 
     title: Mapped[str] = mapped_column(String, index=True, nullable=False)
 
@@ -32,14 +44,19 @@ class Vault(Base):
     encryption_iv: Mapped[bytes] = mapped_column(LargeBinary(length=24), nullable=False)
 
     tags: Mapped[Optional[List[str]]] = mapped_column(ARRAY(String), nullable=True)
+
+    # distinct lowercased tags, maintained alongside `tags` for indexed lookups
+    # (the PostgreSQL ARRAY type provides contains(), i.e. @>)
+    tags_normalized: Mapped[Optional[List[str]]] = mapped_column(postgresql.ARRAY(String), nullable=True)
     
     created_at: Mapped[datetime] = mapped_column(
-        DateTime, default=datetime.now(), nullable=False
+        DateTime, default=datetime.now, nullable=False
     )
 
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime, default=datetime.now(), nullable=True, onupdate=func.now()
+        DateTime, default=datetime.now, nullable=True, onupdate=datetime.now
     )
 
-    # Many-to-one relationship with User
-    user: Mapped["User"] = relationship("User", lazy="selectin")
+    # Many-to-one relationship with User; only loaded when a query asks for it
+    # (selectinload), never implicitly
+    user: Mapped["User"] = relationship("User", lazy="raise")
@@ -0,0 +1,19 @@
+from sqlalchemy import ForeignKey, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..database import Base
+
+
+class VaultTag(Base):
+    """Per-user tag index: how many of the user's records carry each tag."""
+    __tablename__ = "vault_tags"
+
+    user_id: Mapped[str] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+
+    # lowercased tag, the lookup key
+    tag: Mapped[str] = mapped_column(String, primary_key=True)
+
+    # display form (case of the first occurrence)
+    display: Mapped[str] = mapped_column(String, nullable=False)
+
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -0,0 +1,23 @@
+from datetime import datetime
+from sqlalchemy import DateTime, ForeignKey, Index, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..database import Base
+
+
+class VaultTombstone(Base):
+    """Marks a deleted vault record so that delta sync clients can drop it."""
+    __tablename__ = "vault_tombstones"
+    __table_args__ = (
+        Index("ix_vault_tombstones_user_id_deleted_at", "user_id", "deleted_at"),
+    )
+
+    # keyed per user: ids may be chosen by clients, so two users can each
+    # have deleted a record with the same id
+    user_id: Mapped[str] = mapped_column(ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+
+    # id of the deleted vault record
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+
+    # compaction removes rows older than VAULT_TOMBSTONE_RETENTION_DAYS
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, index=True, nullable=False)
@@ -4,6 +4,17 @@ from pydantic import BaseModel, EmailStr, Field, PlainSerializer, field_validato
 
 from ..core.common import base64url_decode, base64url_encode, serialize_datetime
 
+# Binary fields are base64url strings in JSON and raw bytes in msgpack
+Base64UrlBytes = Annotated[bytes, PlainSerializer(base64url_encode, return_type=str, when_used="json")]
+
+def decode_binary(v):
+    """Input side of Base64UrlBytes: a base64url string (JSON) or raw bytes (msgpack)."""
+    if isinstance(v, str):
+        return base64url_decode(v)
+    if isinstance(v, (bytes, bytearray)):
+        return bytes(v)
+    raise TypeError("expected bytes or base64 string for binary field")
+
 class UserInfo(BaseModel):
     id: Optional[str] = None
     full_name: str
@@ -24,14 +35,14 @@ class RegisterStartRequest(BaseModel):
 
     @field_validator("registration_request", mode="before")
     def _decode_b64url(cls, v):
-        if isinstance(v, str):
-            return base64url_decode(v)
-        raise TypeError("expected bytes or base64 string for binary field")
+        return decode_binary(v)
 
 class RegistrationStartResponse(BaseModel):
-    registration_response: str = Field(..., example="QWxhZGRpbjpvcGVuIHNlc2FtZQ==")  # Opaque registration response as a base64-encoded string
+    handshake_id: Optional[str] = None
+    registration_response: Base64UrlBytes = Field(..., example="QWxhZGRpbjpvcGVuIHNlc2FtZQ==")  # Opaque registration response
 
 class RegisterFinishRequest(BaseModel):
+    handshake_id: str
     user_info: UserInfo
     master_key_salt: bytes
     encrypted_vault_key: bytes
@@ -46,9 +57,7 @@ class RegisterFinishRequest(BaseModel):
             mode="before",
             )
     def _decode_b64url(cls, v):
-        if isinstance(v, str):
-            return base64url_decode(v)
-        raise TypeError("expected bytes or base64 string for binary field")
+        return decode_binary(v)
 
 class RegisterFinishResponse(BaseModel):
     user_info: Optional[UserInfo] = None
@@ -83,14 +92,14 @@ class LoginStartRequest(BaseModel):
     
     @field_validator("login_request", mode="before")
     def _decode_b64url(cls, v):
-        if isinstance(v, str):
-            return base64url_decode(v)
-        raise TypeError("expected bytes or base64 string for binary field")
+        return decode_binary(v)
 
 class LoginStartResponse(BaseModel):
-    login_response: str = Field(..., example="QWxhZGRpbjpvcGVuIHNlc2FtZQ==") 
+    handshake_id: Optional[str] = None
+    login_response: Base64UrlBytes = Field(..., example="QWxhZGRpbjpvcGVuIHNlc2FtZQ==")
 
 class LoginFinishRequest(BaseModel):
+    handshake_id: str
     email: EmailStr = Field(..., example="john.doe@example.com")
     finish_login_request: bytes = Field(..., example="QWxhZGRpbjpvcGVuIHNlc2FtZQ==")
 
@@ -102,9 +111,7 @@ class LoginFinishRequest(BaseModel):
     
     @field_validator("finish_login_request", mode="before")
     def _decode_b64url(cls, v):
-        if isinstance(v, str):
-            return base64url_decode(v)
-        raise TypeError("expected bytes or base64 string for binary field")
+        return decode_binary(v)
 
 class UserLogin(BaseModel):
     email: EmailStr = Field(..., example="john.doe@example.com")
@@ -115,8 +122,16 @@ class UserPublic(UserPublicBase):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    access_token: Optional[str] = None
+    refresh_token: Optional[str] = None
+
 class TokenPayload(BaseModel):
     sub: str
     exp: int
@@ -125,9 +140,10 @@ class TokenPayload(BaseModel):
 class AuthResponse(BaseModel):
     status: bool
     access_token: str 
-    master_key_salt: Annotated[bytes, PlainSerializer(lambda x: base64url_encode(x), return_type=str)]
-    encrypted_vault_key: Annotated[bytes, PlainSerializer(lambda x: base64url_encode(x), return_type=str)]
-    vault_key_nonce: Annotated[bytes, PlainSerializer(lambda x: base64url_encode(x), return_type=str)]
+    refresh_token: Optional[str] = None
+    master_key_salt: Base64UrlBytes
+    encrypted_vault_key: Base64UrlBytes
+    vault_key_nonce: Base64UrlBytes
 
     # 3. Public User Details (Optional)
     user: Optional[UserPublic] = None
@@ -155,10 +171,10 @@ class UserRecordResponse(BaseModel):
     message: Optional[str] = None
 
 class UserRecord(UserPublicBase):
-    master_key_salt: Annotated[bytes, PlainSerializer(lambda x: base64url_encode(x), return_type=str)]
-    # master_key_verifier: Annotated[bytes, PlainSerializer(lambda x: base64url_encode(x), return_type=str)]
-    vault_key_encrypted: Annotated[bytes, PlainSerializer(lambda x: base64url_encode(x), return_type=str)]
-    vault_key_nonce: Annotated[bytes, PlainSerializer(lambda x: base64url_encode(x), return_type=str)]
+    master_key_salt: Base64UrlBytes
+    # master_key_verifier: Base64UrlBytes
+    vault_key_encrypted: Base64UrlBytes
+    vault_key_nonce: Base64UrlBytes
 
     created_at: Annotated[
         datetime.datetime,
@@ -175,6 +191,7 @@ class ResetStartRequest(RegisterStartRequest):
 class ResetStartResponse(RegistrationStartResponse):
     pass
 class ResetFinishRequest(BaseModel):
+    handshake_id: str
     user_id: str
     master_key_salt: bytes
     encrypted_vault_key: bytes
@@ -189,9 +206,7 @@ class ResetFinishRequest(BaseModel):
             mode="before",
             )
     def _decode_b64url(cls, v):
-        if isinstance(v, str):
-            return base64url_decode(v)
-        raise TypeError("expected bytes or base64 string for binary field")
+        return decode_binary(v)
 class ResetFinishResponse(BaseModel):
     user_info: Optional[UserInfo] = None
     status: bool
\ No newline at end of file
@@ -1,12 +1,13 @@
 
 import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 from typing_extensions import Annotated
 from pydantic import BaseModel, Field, PlainSerializer, field_validator
 
-from ..core.common import base64url_decode, base64url_encode, serialize_datetime
+from ..core.common import serialize_datetime
+from ..core.config import settings
 
-from ..schemas.user import UserInfo
+from ..schemas.user import Base64UrlBytes, UserInfo, decode_binary
 
 class VaultBasicInfo(BaseModel):
     id: str
@@ -15,14 +16,15 @@ class VaultBasicInfo(BaseModel):
     class Config:
         from_attributes = True
 
-class VaultInfo(BaseModel):
+class VaultRecord(BaseModel):
+    """A vault record without its owner (used by the compact list envelope)."""
     id: Optional[str] = None
     title: str
     login_id: str
     notes: Optional[str] = None
-    password_ciphertext: Annotated[bytes, PlainSerializer(lambda x: base64url_encode(x), return_type=str)]
-    # login_id_ciphertext: Optional[Annotated[bytes, PlainSerializer(lambda x: base64url_encode(x), return_type=str)]] = None
-    encryption_iv: Annotated[bytes, PlainSerializer(lambda x: base64url_encode(x), return_type=str)]
+    password_ciphertext: Base64UrlBytes
+    # login_id_ciphertext: Optional[Base64UrlBytes] = None
+    encryption_iv: Base64UrlBytes
     tags: Optional[List[str]] = None
     created_at: Annotated[
         datetime.datetime,
@@ -32,13 +34,36 @@ class VaultInfo(BaseModel):
         datetime.datetime,
         PlainSerializer(serialize_datetime, return_type=str)
     ]
-    user: UserInfo = Field(alias="user")
 
     class Config:
         from_attributes = True
 
+class VaultInfo(VaultRecord):
+    user: UserInfo = Field(alias="user")
+
+def vault_record_dict(record, user: Optional[dict] = None) -> dict:
+    """Plain-dict form of a VaultRecord (a VaultInfo when ``user`` is given) from an ORM object or row.
+
+    Equivalent to the model's python-mode dump (binary fields stay bytes) without
+    a validation pass; the list endpoints use it for their records.
+    """
+    data = {
+        "id": record.id,
+        "title": record.title,
+        "login_id": record.login_id,
+        "notes": record.notes,
+        "password_ciphertext": record.password_ciphertext,
+        "encryption_iv": record.encryption_iv,
+        "tags": record.tags,
+        "created_at": serialize_datetime(record.created_at),
+        "updated_at": serialize_datetime(record.updated_at) if record.updated_at is not None else None,
+    }
+    if user is not None:
+        data["user"] = user
+    return data
+
 class VaultRecordRequest(BaseModel):
-    id: Optional[str] = None
+    id: Optional[str] = Field(None, max_length=36)
     user_id: str = Field(exclude=True)
     title: str
     login_id: str
@@ -54,9 +79,70 @@ class VaultRecordRequest(BaseModel):
             mode="before",
             )
     def _decode_b64url(cls, v):
-        if isinstance(v, str):
-            return base64url_decode(v)
-        raise TypeError("expected string for binary field")
+        return decode_binary(v)
+
+class VaultImportRecord(BaseModel):
+    """One line of an NDJSON import; an exported VaultRecord line is accepted as is (id is reassigned)."""
+    title: str
+    login_id: str
+    notes: Optional[str] = None
+    password_ciphertext: bytes
+    encryption_iv: bytes
+    tags: Optional[List[str]] = None
+    created_at: Optional[datetime.datetime] = None
+
+    @field_validator(
+            "password_ciphertext",
+            "encryption_iv",
+            mode="before",
+            )
+    def _decode_b64url(cls, v):
+        return decode_binary(v)
+
+class VaultImportResponse(BaseModel):
+    status: bool
+    imported: int = 0
+    message: Optional[str] = None
+
+class VaultBatchUpsert(BaseModel):
+    """Creates the record, or updates it when ``id`` is one of the user's records."""
+    op: Literal["upsert"]
+    id: Optional[str] = Field(None, max_length=36)
+    title: str
+    login_id: str
+    notes: Optional[str] = None
+    password_ciphertext: bytes
+    encryption_iv: bytes
+    tags: Optional[List[str]] = None
+
+    @field_validator(
+            "password_ciphertext",
+            "encryption_iv",
+            mode="before",
+            )
+    def _decode_b64url(cls, v):
+        return decode_binary(v)
+
+class VaultBatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: str = Field(max_length=36)
+
+class VaultBatchRequest(BaseModel):
+    operations: List[Annotated[Union[VaultBatchUpsert, VaultBatchDelete], Field(discriminator="op")]] = Field(
+        min_length=1, max_length=settings.VAULT_BATCH_MAX_OPS
+    )
+
+class VaultBatchResult(BaseModel):
+    op: str
+    id: Optional[str] = None
+    status: bool
+    record: Optional[VaultRecord] = None
+    message: Optional[str] = None
+
+class VaultBatchResponse(BaseModel):
+    status: bool
+    results: Optional[List[VaultBatchResult]] = None
+    message: Optional[str] = None
 
 class VaultRecordResponse(BaseModel):
     status: bool
@@ -67,8 +153,31 @@ class VaultRecordsResponse(BaseModel):
     status: bool
     records: Optional[List[VaultInfo]] = None
     message: Optional[str] = None
+    next_cursor: Optional[str] = None
+
+class VaultCompactRecordsResponse(BaseModel):
+    """List envelope that carries the owner once instead of on every record."""
+    status: bool
+    owner: Optional[UserInfo] = None
+    records: Optional[List[VaultRecord]] = None
+    message: Optional[str] = None
+    next_cursor: Optional[str] = None
+
+class VaultChangesResponse(BaseModel):
+    """Delta sync result; with ``reset`` set, ``records`` is the full vault and replaces the client's copy."""
+    status: bool
+    records: Optional[List[VaultRecord]] = None
+    deleted: Optional[List[str]] = None
+    reset: bool = False
+    next_since: Optional[str] = None
+    message: Optional[str] = None
+
+class VaultTagCount(BaseModel):
+    tag: str
+    count: int
 
 class VaultTagsResponse(BaseModel):
     status: bool
     tags: Optional[List[str]] = None
+    tag_counts: Optional[List[VaultTagCount]] = None
     message: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""Production server: pre-forked uvicorn workers sharing one listening socket.
+
+The app is imported once in the master and inherited by every worker, which
+runs its own event loop (uvloop + httptools). Each worker gets an equal
+share of DB_CONNECTION_BUDGET as its pool. SIGTERM/SIGINT drain the workers:
+they stop accepting, finish in-flight requests (up to
+SERVER_GRACEFUL_TIMEOUT), run the lifespan shutdown and exit.
+
+    python -m app.server [--workers N] [--host HOST] [--port PORT]
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import time
+
+from .core.config import settings
+from .core.logs import stop_logging
+
+logger = logging.getLogger("app.server")
+
+# time allowed after the graceful timeout for lifespan shutdown before workers are killed
+SHUTDOWN_MARGIN_SECONDS = 10
+# a worker that dies sooner than this after starting is restarted with a delay
+MIN_WORKER_LIFETIME_SECONDS = 5
+
+
+def worker_count(requested: int) -> int:
+    return requested if requested > 0 else (os.cpu_count() or 1)
+
+
+def pool_sizes(budget: int, workers: int) -> tuple[int, int]:
+    """Splits a global connection budget into (pool_size, max_overflow) per worker."""
+    per_worker = max(budget // workers, 1)
+    max_overflow = per_worker // 4
+    return per_worker - max_overflow, max_overflow
+
+
+def _configure(workers: int) -> bool:
+    """Adjusts settings for ``workers`` processes; returns whether the handshake store was switched.
+
+    Must run before the app (and so the engine) is imported.
+    """
+    if settings.DB_CONNECTION_BUDGET > 0:
+        settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW = pool_sizes(settings.DB_CONNECTION_BUDGET, workers)
+
+    if workers > 1 and settings.HANDSHAKE_STORE_BACKEND == "memory":
+        # login/start and login/finish may reach different workers, and a
+        # draining worker's memory is gone once it exits
+        settings.HANDSHAKE_STORE_BACKEND = "sqlite"
+        return True
+    return False
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(settings.SERVER_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket) -> None:
+    import uvicorn
+
+    from .database.session import engine, replica_engine
+
+    # the master's handlers are inherited; uvicorn installs its own in serve()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # the pools are empty in the master, but must not share state across the fork
+    engine.sync_engine.dispose(close=False)
+    if replica_engine is not None:
+        replica_engine.sync_engine.dispose(close=False)
+
+    config = uvicorn.Config(
+        app,
+        loop="uvloop",
+        http="httptools",
+        lifespan="on",
+        log_config=None,  # keep the app's logging setup
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(app, sock)
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+            code = 1
+        finally:
+            stop_logging()  # os._exit skips atexit: flush queued records first
+            os._exit(code)
+    return pid
+
+
+def serve(host: str, port: int, workers: int) -> None:
+    switched_store = _configure(workers)
+
+    from .main import app  # preloaded: imported once, shared by the forked workers
+
+    if switched_store:
+        logger.warning("HANDSHAKE_STORE_BACKEND=memory does not work across workers; using sqlite at %s",
+                       settings.HANDSHAKE_STORE_PATH)
+
+    sock = _bind(host, port)
+    logger.info("Listening on %s:%d with %d workers (DB pool %d + %d overflow per worker)",
+                host, port, workers, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
+
+    started: dict[int, float] = {}
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        logger.info("Received %s, draining %d workers", signal.Signals(signum).name, len(started))
+        for pid in started:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    for _ in range(workers):
+        started[_spawn(app, sock)] = time.monotonic()
+
+    deadline = None
+    while started:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            if stopping:
+                deadline = deadline or time.monotonic() + settings.SERVER_GRACEFUL_TIMEOUT + SHUTDOWN_MARGIN_SECONDS
+                if time.monotonic() > deadline:
+                    logger.warning("Killing %d workers still running after the graceful timeout", len(started))
+                    for child in started:
+                        os.kill(child, signal.SIGKILL)
+            time.sleep(0.2)
+            continue
+
+        lifetime = time.monotonic() - started.pop(pid, time.monotonic())
+        if stopping:
+            continue
+
+        logger.error("Worker %d exited with status %d; restarting", pid, os.waitstatus_to_exitcode(status))
+        if lifetime < MIN_WORKER_LIFETIME_SECONDS:
+            time.sleep(1)
+        started[_spawn(app, sock)] = time.monotonic()
+
+    sock.close()
+    logger.info("All workers stopped")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS,
+                        help="worker processes (0: one per CPU core)")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, worker_count(args.workers))
+
+
+if __name__ == "__main__":
+    main()
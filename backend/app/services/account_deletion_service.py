@@ -0,0 +1,59 @@
+import asyncio
+import logging
+
+from ..core.config import settings
+from ..core.metrics import register_stats
+from ..core.snapshot_cache import vault_snapshot_cache
+from ..crud.user_crud import get_deleted_user_ids, purge_deleted_user
+
+logger = logging.getLogger(__name__)
+
+# Set by DELETE /user/{id} so that the worker starts purging without waiting
+# for its next poll; the poll picks up accounts left by a restart or another worker.
+_wakeup = asyncio.Event()
+_stats = {"requested": 0, "purged": 0, "records_purged": 0, "failures": 0}
+
+
+def request_account_purge() -> None:
+    _stats["requested"] += 1
+    _wakeup.set()
+
+
+async def purge_deleted_accounts(session_factory, chunk_size: int) -> int:
+    """Purges every account marked as deleted, one at a time; returns how many were purged."""
+    purged = 0
+    while True:
+        async with session_factory() as session:
+            user_ids = await get_deleted_user_ids(session, limit=100)
+        if not user_ids:
+            return purged
+
+        for user_id in user_ids:
+            async with session_factory() as session:
+                records = await purge_deleted_user(session, user_id, chunk_size)
+            vault_snapshot_cache.invalidate_user(user_id)
+            _stats["purged"] += 1
+            _stats["records_purged"] += records
+            purged += 1
+            logger.info("Purged deleted account %s (%d vault records)", user_id, records)
+
+
+async def run_account_deletion_worker(session_factory, interval: int) -> None:
+    """Lifespan task: purges deleted accounts when asked to, and every ``interval`` seconds."""
+    while True:
+        try:
+            await purge_deleted_accounts(session_factory, settings.ACCOUNT_DELETE_CHUNK_SIZE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _stats["failures"] += 1
+            logger.error("Failed to purge deleted accounts: %s", e)
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+
+register_stats("account_deletion", lambda: dict(_stats))
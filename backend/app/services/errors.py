@@ -0,0 +1,42 @@
+import functools
+import logging
+from typing import Optional
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from ..core.crypto_executor import CryptoPoolBusy
+
+# answered with 503 + Retry-After by the app-level handlers (see main.py);
+# a service must let them through rather than report them as a failed call
+OVERLOAD_ERRORS = (CryptoPoolBusy, PoolTimeoutError)
+
+
+def service_errors(action: str, response: Optional[type[BaseModel]] = None,
+                   status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR, detail: Optional[str] = None):
+    """Reports unexpected errors of a service call instead of letting them escape.
+
+    The error is logged as "Error <action>" and answered with
+    ``response(status=False, message=...)``, or -- without a response model --
+    with an HTTPException(status_code, detail). HTTPException and
+    OVERLOAD_ERRORS propagate unchanged.
+    """
+    def decorator(func):
+        logger = logging.getLogger(func.__module__)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except (HTTPException, *OVERLOAD_ERRORS):
+                raise
+            except Exception as e:
+                logger.error("Error %s: %s", action, e)
+                if response is None:
+                    raise HTTPException(status_code=status_code, detail=detail or str(e))
+                return response(status=False, message=str(e))
+
+        return wrapper
+
+    return decorator
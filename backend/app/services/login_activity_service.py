@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from ..core.metrics import register_stats
+from ..crud.user_crud import update_last_login_batch
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Write-behind buffer of user_id -> last login time, flushed by a lifespan task
+# so that login/finish never waits on a commit just to stamp last_login_at.
+_pending_logins: dict[str, datetime] = {}
+_stats = {"recorded": 0, "flushed": 0, "flushes": 0, "failures": 0}
+
+
+def record_login(user_id: str, at: Optional[datetime] = None) -> None:
+    _pending_logins[user_id] = at or datetime.now()
+    _stats["recorded"] += 1
+
+
+async def flush_login_activity(session_factory) -> int:
+    """Writes every buffered last_login_at in a single UPDATE; returns the row count."""
+    global _pending_logins
+    if not _pending_logins:
+        return 0
+
+    batch, _pending_logins = _pending_logins, {}
+    try:
+        async with session_factory() as session:
+            await update_last_login_batch(session, batch)
+    except Exception:
+        _stats["failures"] += 1
+        # put the batch back, keeping any newer login recorded meanwhile
+        for user_id, at in batch.items():
+            if user_id not in _pending_logins or _pending_logins[user_id] < at:
+                _pending_logins[user_id] = at
+        raise
+
+    _stats["flushes"] += 1
+    _stats["flushed"] += len(batch)
+    return len(batch)
+
+
+async def run_login_activity_flusher(session_factory, interval: int) -> None:
+    """Lifespan task: flushes the buffer every ``interval`` seconds, and once more on shutdown."""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await flush_login_activity(session_factory)
+            except Exception as e:
+                logger.error("Failed to flush last login updates: %s", e)
+    finally:
+        try:
+            await flush_login_activity(session_factory)
+        except Exception as e:
+            logger.error("Failed to flush last login updates on shutdown: %s", e)
+
+
+register_stats("login_activity", lambda: {**_stats, "pending": len(_pending_logins)})
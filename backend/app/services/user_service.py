@@ -1,74 +1,78 @@
-from datetime import datetime
-import traceback
 from typing import Optional
 from fastapi import HTTPException, status
-import opaque
 from sqlalchemy.ext.asyncio import AsyncSession
-import time
 
-from ..core.auth_jwt import create_access_token
-from ..core.common import base64url_decode, base64url_encode
-from ..schemas.user import AuthResponse, LoginFinishRequest, LoginStartRequest, LoginStartResponse, RegisterFinishRequest, RegisterFinishResponse, RegisterStartRequest, RegistrationStartResponse, ResetFinishRequest, ResetFinishResponse, UserPublic, UserRecord, UserRecordResponse, UserRegister
+from ..core import crypto_executor as crypto
+from ..core.common import mask_email
+from ..core.auth_jwt import REFRESH_TOKEN_TYPE, create_access_token, create_refresh_token, decode_token
+from ..core.handshake_store import create_handshake_store, new_handshake_id
+from ..core.revocation import revoke_token_claims
+from ..schemas.user import AuthResponse, LoginFinishRequest, LogoutRequest, RefreshTokenRequest, Token, LoginStartRequest, LoginStartResponse, RegisterFinishRequest, RegisterFinishResponse, RegisterStartRequest, RegistrationStartResponse, ResetFinishRequest, ResetFinishResponse, UserPublic, UserRecord, UserRecordResponse, UserRegister
 from ..crud.user_crud import get_user_by_email, create_user, get_user_by_id, update_user, update_user_profile
-from ..core import settings
+from ..models.user import User
+from .errors import service_errors
+from .login_activity_service import record_login
 import logging
 
 logger = logging.getLogger(__name__)
 
-_registration_state_store: dict[str, tuple[bytes, float]] = {}
-_login_state_store: dict[str, tuple[bytes, float]] = {}
-_REGISTRATION_STATE_TTL = 300  # seconds (5 minutes)
-_LOGIN_STATE_TTL = 300  # seconds (5 minutes)
-
-# TODO replace this temporary storage with better solution
-def _cleanup_registration_store() -> None:
-    now = time.time()
-    expired = [k for k, (_, ts) in _registration_state_store.items() if now - ts > _REGISTRATION_STATE_TTL]
-    for k in expired:
-        del _registration_state_store[k]
-
-def store_secS_for_email(email: str, secS: bytes) -> None:
-    _cleanup_registration_store()
-    _registration_state_store[email] = (secS, time.time())
-
-def pop_secS_for_email(email: str) -> Optional[bytes]:
-    entry = _registration_state_store.pop(email, None)
-    return entry[0] if entry is not None else None
-
-def _cleanup_login_store() -> None:
-    now = time.time()
-    expired = [k for k, (_, ts) in _login_state_store.items() if now - ts > _LOGIN_STATE_TTL]
-    for k in expired:
-        del _login_state_store[k]
-
-def store_login_secS_for_email(email: str, secS: bytes) -> None:
-    _cleanup_login_store()
-    _login_state_store[email] = (secS, time.time())
-
-def pop_login_secS_for_email(email: str) -> Optional[bytes]:
-    entry = _login_state_store.pop(email, None)
-    return entry[0] if entry is not None else None
-
-
-def process_user_register_or_reset_start(request: RegisterStartRequest) -> RegistrationStartResponse:
+# Pending handshakes are keyed by a per-handshake id (not the email) so that
+# concurrent logins for one account don't overwrite each other.
+_registration_state_store = create_handshake_store("registration")
+_login_state_store = create_handshake_store("login")
+
+
+async def store_registration_state(email: str, secS: bytes) -> str:
+    handshake_id = new_handshake_id()
+    await _registration_state_store.put(handshake_id, {"email": email, "secS": secS})
+    return handshake_id
+
+async def pop_registration_secS(handshake_id: str, email: str) -> Optional[bytes]:
+    state = await _registration_state_store.pop(handshake_id)
+    if state is None or state["email"] != email:
+        return None
+    return state["secS"]
+
+async def store_login_state(user: User, secS: bytes) -> str:
+    # carry everything login/finish needs so it doesn't look the user up again
+    handshake_id = new_handshake_id()
+    await _login_state_store.put(handshake_id, {
+        "email": user.email,
+        "secS": secS,
+        "user_id": user.id,
+        "full_name": user.full_name,
+        "two_fa_enabled": user.two_fa_enabled,
+        "master_key_salt": user.master_key_salt,
+        "vault_key_encrypted": user.vault_key_encrypted,
+        "vault_key_nonce": user.vault_key_nonce,
+    })
+    return handshake_id
+
+async def pop_login_state(handshake_id: str, email: str) -> Optional[dict]:
+    state = await _login_state_store.pop(handshake_id)
+    if state is None or state["email"] != email:
+        return None
+    return state
+
+
+async def process_user_register_or_reset_start(request: RegisterStartRequest) -> RegistrationStartResponse:
     logger.debug("Processing user registration start...")
 
-    server_key = base64url_decode(settings.SERVER_KEY)
-
-    secS, pub = opaque.CreateRegistrationResponse(request.registration_request, server_key)
+    secS, pub = await crypto.create_registration_response(request.registration_request)
 
-    # length of secS
-    logger.debug("Length of secS: %d, Expected: %d", len(secS), opaque.OPAQUE_REGISTER_SECRET_LEN)
+    logger.debug("Length of secS: %d", len(secS))
 
+    handshake_id = None
     try:
-        store_secS_for_email(request.email, secS)
+        handshake_id = await store_registration_state(request.email, secS)
     except Exception:
         # don't expose internal errors to client; log and continue
-        logger.error("Warning: failed to store secS in temporary store for %s", request.email)
+        logger.error("Warning: failed to store secS in temporary store for %s", mask_email(request.email))
     
 
     return RegistrationStartResponse(
-        registration_response=base64url_encode(pub)
+        handshake_id=handshake_id,
+        registration_response=pub
     )
 
 async def process_user_register_finish(request: RegisterFinishRequest, db: AsyncSession) -> RegisterFinishResponse:
@@ -76,17 +80,17 @@ async def process_user_register_finish(request: RegisterFinishRequest, db: Async
     logger.debug("Processing user registration finish...")
 
     #  check user existence
-    existing = await get_user_by_email(db, request.user_info.email)
+    existing = await get_user_by_email(db, request.user_info.email, include_deleted=True)
     if existing:
-        logger.warning("User already exists with email: %s", request.user_info.email)
+        logger.warning("User already exists with email: %s", mask_email(request.user_info.email))
         return RegisterFinishResponse(status=False)
 
-    secS = pop_secS_for_email(request.user_info.email)
+    secS = await pop_registration_secS(request.handshake_id, request.user_info.email)
+    if secS is None:
+        logger.warning("No pending registration handshake for: %s", mask_email(request.user_info.email))
+        return RegisterFinishResponse(status=False)
 
-    rec1 = opaque.StoreUserRecord(
-        secS,
-        request.master_key_verifier,
-    )
+    rec1 = await crypto.store_user_record(secS, request.master_key_verifier)
 
     # Create new user
     user_data = UserRegister(
@@ -101,80 +105,74 @@ async def process_user_register_finish(request: RegisterFinishRequest, db: Async
     new_user = await create_user(db, user_data)
 
     if not new_user:
-        print("Failed to create new user.")
+        logger.error("Failed to create new user")
         return RegisterFinishResponse(status=False)
 
     logger.info("Successfully created new user with ID: %s", new_user.id)
 
     return RegisterFinishResponse(status=True)
 
+@service_errors("processing user login start", detail="Failed to process user login start")
 async def process_user_login_start(request: LoginStartRequest, db: AsyncSession):
-    try:
-        logger.debug("Processing user login start...")
-        user = await get_user_by_email(db, request.email)
-        if not user:
-            logger.warning("No user found with email: %s", request.email)
-            raise HTTPException(status_code=400, detail="Invalid credentials")
+    logger.debug("Processing user login start...")
+    user = await get_user_by_email(db, request.email)
+    if not user:
+        logger.warning("No user found with email: %s", mask_email(request.email))
+        raise HTTPException(status_code=400, detail="Invalid credentials")
         
 
-        ids = opaque.Ids(request.email, settings.SERVER_IDENTITY)
-        ctx = settings.SERVER_IDENTITY + "-" + settings.APP_VERSION
-
-        resp, sk, secS = opaque.CreateCredentialResponse(request.login_request, user.master_key_verifier, ids, ctx )
+    resp, sk, secS = await crypto.create_credential_response(request.login_request, user.master_key_verifier, request.email)
 
-        try:
-            store_login_secS_for_email(request.email, secS)
-        except Exception:
-            # don't expose internal errors to client; log and continue
-            logger.error("Warning: failed to store login secS in temporary store for %s", request.email)
-
-        base64Resp = base64url_encode(resp)
-
-        logger.debug("Create Credential Response: %s", base64Resp)
-
-        return LoginStartResponse(login_response=base64Resp)
-
-    except Exception as e:
-        logger.error("Error processing user login start: %s", e)
-        raise HTTPException(status_code=500, detail="Failed to process user login start")
-
-async def process_user_login_finish(request: LoginFinishRequest, db: AsyncSession):
+    handshake_id = None
     try:
-        logger.debug("Processing user login finish...")
-        user = await get_user_by_email(db, request.email)
-        if not user:
-            logger.warning("No user found with email: %s", request.email)
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-        
-        secS = pop_login_secS_for_email(request.email)
-        # if matched, no error thrown
-        opaque.UserAuth(secS, request.finish_login_request) 
-
-        # JWT token
-        access_token = create_access_token(subject=user.id)
-
-        auth_response = AuthResponse(
-            status=True,
-            access_token=access_token,
-            master_key_salt=user.master_key_salt,
-            encrypted_vault_key=user.vault_key_encrypted,
-            vault_key_nonce=user.vault_key_nonce,
-            user=UserPublic.model_validate(user)
+        handshake_id = await store_login_state(user, secS)
+    except Exception:
+        # don't expose internal errors to client; log and continue
+        logger.error("Warning: failed to store login secS in temporary store for %s", mask_email(request.email))
+
+    logger.debug("Create Credential Response: %d bytes", len(resp))
+
+    return LoginStartResponse(handshake_id=handshake_id, login_response=resp)
+
+@service_errors("processing user login finish", status_code=status.HTTP_401_UNAUTHORIZED, detail="Failed to process user login finish")
+async def process_user_login_finish(request: LoginFinishRequest):
+    logger.debug("Processing user login finish...")
+
+    # the user record was resolved by login/start and travels with the handshake
+    state = await pop_login_state(request.handshake_id, request.email)
+    if state is None:
+        logger.warning("No pending login handshake for: %s", mask_email(request.email))
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+
+    # if matched, no error thrown
+    await crypto.user_auth(state["secS"], request.finish_login_request)
+
+    # JWT token
+    access_token = create_access_token(subject=state["user_id"])
+    refresh_token = create_refresh_token(subject=state["user_id"])
+
+    auth_response = AuthResponse(
+        status=True,
+        access_token=access_token,
+        refresh_token=refresh_token,
+        master_key_salt=state["master_key_salt"],
+        encrypted_vault_key=state["vault_key_encrypted"],
+        vault_key_nonce=state["vault_key_nonce"],
+        user=UserPublic(
+            id=state["user_id"],
+            full_name=state["full_name"],
+            email=state["email"],
+            two_fa_enabled=state["two_fa_enabled"],
         )
+    )
 
-        # update login timestamp
-        user.last_login_at = datetime.now()
-        await db.commit()
-        await db.refresh(user)
-
-        return auth_response
+    # update login timestamp (flushed in batches by the login activity task)
+    record_login(state["user_id"])
 
-    except Exception as e:
-        logger.error("Error processing user login finish: %s", e)
-        traceback.print_exc()
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Failed to process user login finish")
+    return auth_response
 
     
+@service_errors("updating user profile", UserRecordResponse)
 async def process_user_update_profile (
         user_id: str,
         profile_data: UserPublic,
@@ -189,20 +187,12 @@ async def process_user_update_profile (
                 message="User not found or unauthorized"
             )
         
-        try:
-            updated_user = await update_user_profile(db, profile_data)
-            return UserRecordResponse(
-                status=True,
-                user=UserPublic.model_validate(updated_user),
-                message="User profile updated successfully"
-            )
-        except Exception as e:
-            print("Error logging user profile update:", e)
-            return UserRecordResponse(
-                status=False,
-                user=None,
-                message=str(e)
-            )
+        updated_user = await update_user_profile(db, profile_data)
+        return UserRecordResponse(
+            status=True,
+            user=UserPublic.model_validate(updated_user),
+            message="User profile updated successfully"
+        )
 
 async def process_get_user_record(
         user_id: str,
@@ -226,14 +216,14 @@ async def process_reset_master_pwd_finish(request: ResetFinishRequest, db: Async
         logger.warning("User not found: %s", request.user_id)
         return ResetFinishResponse(status=False)
 
-    secS = pop_secS_for_email(user.email)
+    secS = await pop_registration_secS(request.handshake_id, user.email)
 
     logger.debug("Length of retrieved secS: %s", len(secS) if secS else "None")
+    if secS is None:
+        logger.warning("No pending reset handshake for user: %s", request.user_id)
+        return ResetFinishResponse(status=False)
 
-    rec1 = opaque.StoreUserRecord(
-        secS,
-        request.master_key_verifier,
-    )
+    rec1 = await crypto.store_user_record(secS, request.master_key_verifier)
 
     user.master_key_salt = request.master_key_salt
     user.master_key_verifier = rec1
@@ -249,4 +239,45 @@ async def process_reset_master_pwd_finish(request: ResetFinishRequest, db: Async
 
     logger.info("Successfully updated user with ID: %s", updated_user.id)
 
-    return ResetFinishResponse(status=True, user_info=UserPublic.model_validate(updated_user))
\ No newline at end of file
+    return ResetFinishResponse(status=True, user_info=UserPublic.model_validate(updated_user))
+
+async def process_token_refresh(request: RefreshTokenRequest, db: AsyncSession) -> Token:
+    """Exchanges a refresh token for a new access/refresh pair (rotation)."""
+    try:
+        claims = decode_token(request.refresh_token)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+
+    if claims.get("type") != REFRESH_TOKEN_TYPE or not claims.get("jti"):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+
+    user = await get_user_by_id(db, claims["sub"])
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+
+    # each refresh token is single use: revoking it is the check, so of two
+    # concurrent refreshes with the same token only one gets a new pair
+    if not await revoke_token_claims(db, claims):
+        logger.warning("Revoked refresh token presented for user: %s", claims.get("sub"))
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token has been revoked")
+
+    return Token(
+        access_token=create_access_token(subject=user.id),
+        refresh_token=create_refresh_token(subject=user.id),
+    )
+
+async def process_logout(request: LogoutRequest, db: AsyncSession) -> bool:
+    """Revokes the given access and/or refresh token."""
+    revoked = False
+    for token in (request.access_token, request.refresh_token):
+        if not token:
+            continue
+        try:
+            claims = decode_token(token)
+        except Exception:
+            # expired or invalid tokens need no revocation
+            continue
+        await revoke_token_claims(db, claims)
+        revoked = True
+
+    return revoked
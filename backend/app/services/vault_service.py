@@ -1,169 +1,381 @@
+from datetime import datetime
+from typing import AsyncIterator, Optional
+import uuid
 from fastapi import HTTPException, status
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..crud.vault_crud import create_update_vault, get_unique_tags, get_vault_by_id, get_vaults_by_tag, get_vaults_by_user_id, search_vaults
-from ..schemas.vault import VaultRecordRequest, VaultRecordResponse, VaultRecordsResponse, VaultTagsResponse
+from ..core.common import decode_cursor, encode_cursor
+from ..core.etag import make_etag
+from ..core.serialization import encode, msgpack_requested
+from ..core.snapshot_cache import Snapshot, vault_snapshot_cache
+from ..core.config import settings
+from ..crud.tag_crud import apply_tag_delta, merge_tag_deltas, normalize_tags, tag_delta
+from ..crud.user_crud import bump_vault_version, get_vault_version
+from ..crud.vault_crud import create_update_vault, delete_vaults, get_unique_tags, get_vault_by_id, get_vaults_by_tag, get_vaults_by_user_id, insert_vaults, search_vaults, stream_vaults_by_user_id, upsert_vaults
+from ..database.routing import recent_writes
+from ..models.user import User
+from ..schemas.user import UserInfo
+from ..schemas.vault import vault_record_dict, VaultBatchRequest, VaultBatchResponse, VaultBatchResult, VaultBatchUpsert, VaultCompactRecordsResponse, VaultImportRecord, VaultImportResponse, VaultInfo, VaultRecord, VaultRecordRequest, VaultRecordResponse, VaultRecordsResponse, VaultTagCount, VaultTagsResponse
+from .errors import service_errors
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def process_vault_add_update(request: VaultRecordRequest, db: AsyncSession) -> VaultRecordResponse:
+def _user_dict(user: User) -> dict:
+    return UserInfo.model_validate(user).model_dump(mode="json")
+
+def _records_response(records, owner: Optional[User] = None, next_cursor: Optional[str] = None) -> dict:
+    """Full envelope (owner embedded per record), or the compact one when ``owner`` is given.
+
+    Built as plain data in the shape of VaultRecordsResponse / VaultCompactRecordsResponse:
+    the records come from the database, so validating them again would only cost time.
+    """
+    if owner is not None:
+        return {
+            "status": True,
+            "owner": _user_dict(owner),
+            "records": [vault_record_dict(record) for record in records],
+            "message": None,
+            "next_cursor": next_cursor,
+        }
+
+    # every record has the same owner; serialize it once
+    users: dict[str, dict] = {}
+    return {
+        "status": True,
+        "records": [
+            vault_record_dict(record, users.get(record.user_id) or users.setdefault(record.user_id, _user_dict(record.user)))
+            for record in records
+        ],
+        "message": None,
+        "next_cursor": next_cursor,
+    }
+
+@service_errors("processing vault add/update request", VaultRecordResponse)
+async def process_vault_add_update(request: VaultRecordRequest, db: AsyncSession, owner: User) -> VaultRecordResponse:
+    """Create or update a vault record (one upsert statement; ownership is enforced in SQL).
+
+    Records are created without an id (the server assigns one); an id that is
+    not one of the user's records is a 404.
+    """
     logger.debug("Processing vault add/update request...")
 
-    try:
-        # Check if updating existing record
-        if request.id:
-            logger.info("Updating existing vault record with ID: %s", request.id)
-            existing_vault = await get_vault_by_id(db, request.id)
-            if not existing_vault:
-                logger.warning("Vault record not found for update: %s", request.id)
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Vault record not found for update."
-                )
+    if request.id:
+        logger.info("Updating vault record with ID: %s", request.id)
+    else:
+        logger.info("Creating new vault record for user ID: %s", request.user_id)
+
+    # Create or update the vault record
+    row = await create_update_vault(db, request)
+    if row is None:
+        logger.warning("Vault record not found for update: %s", request.id)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Vault record not found for update."
+        )
+
+    logger.info("Vault record processed successfully with ID: %s", row.id)
+
+    return VaultRecordResponse(
+        status=True,
+        record=VaultInfo.model_validate({**row._mapping, "user": owner})
+    )
+
+@service_errors("processing vault batch", VaultBatchResponse)
+async def process_vault_batch(request: VaultBatchRequest, user_id: str, db: AsyncSession) -> VaultBatchResponse:
+    """Apply many upserts and deletes in one transaction, with one statement per kind.
+
+    Operations are independent: an id may appear only once per batch, so
+    applying all upserts and then all deletes gives the same result as
+    applying them in request order. Each operation gets its own result;
+    ids the user does not own fail individually without aborting the batch.
+    """
+    operations = request.operations
+    seen: set[str] = set()
+    for op in operations:
+        if op.id is None:
+            continue
+        if op.id in seen:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Duplicate record id in batch: {op.id}"
+            )
+        seen.add(op.id)
+
+    ids = [op.id or str(uuid.uuid4()) for op in operations]
+
+    upserted = await upsert_vaults(
+        db, user_id,
+        [(vault_id, op) for vault_id, op in zip(ids, operations) if isinstance(op, VaultBatchUpsert)]
+    )
+    deleted = set(await delete_vaults(
+        db, user_id,
+        [vault_id for vault_id, op in zip(ids, operations) if not isinstance(op, VaultBatchUpsert)]
+    ))
+    await db.commit()
+    vault_snapshot_cache.invalidate_user(user_id)
+    recent_writes.mark(user_id)
+
+    rows = {row.id: row for row in upserted}
+    results = []
+    for vault_id, op in zip(ids, operations):
+        if isinstance(op, VaultBatchUpsert):
+            row = rows.get(vault_id)
+            results.append(VaultBatchResult(
+                op=op.op,
+                id=vault_id,
+                status=row is not None,
+                record=VaultRecord.model_validate(row) if row is not None else None,
+                message=None if row is not None else "Vault record not found or access denied."
+            ))
         else:
-            logger.info("Creating new vault record for user ID: %s", request.user_id)
+            results.append(VaultBatchResult(
+                op=op.op,
+                id=vault_id,
+                status=vault_id in deleted,
+                message=None if vault_id in deleted else "Vault record not found or access denied."
+            ))
 
-        # Create or update the vault record
-        vault_model = await create_update_vault(db, request)
+    logger.info("Vault batch applied: %d upserted, %d deleted of %d operations",
+                len(rows), len(deleted), len(operations))
+    return VaultBatchResponse(
+        status=True,
+        results=results
+    )
 
-        logger.info("Vault record processed successfully with ID: %s", vault_model.id)
-        
-        return VaultRecordResponse(
-            status=True,
-            record=vault_model
-        )
-    except HTTPException:
-        # Re-raise HTTPExceptions to be handled by FastAPI
-        raise
-    except Exception as e:
-        logger.error("Error processing vault add/update request: %s", e)
-        return VaultRecordResponse(
-            status=False,
-            record=None,
-            message=str(e)
-        )
+async def get_vault_etag(user_id: str, db: AsyncSession) -> str:
+    """ETag for the user's vault reads, from the vault version alone (no vaults table access).
 
-async def get_user_vaults(user_id: str, db: AsyncSession) -> VaultRecordsResponse:
-    """Retrieve all vault records for a specific user."""
+    Must be read before the data it labels: a write landing in between then
+    only makes the ETag stale, never newer than the body.
+    """
+    version = await get_vault_version(db, user_id) or 0
+    # each representation (JSON / msgpack) needs its own validator
+    return make_etag(user_id, version, "msgpack" if msgpack_requested() else "json")
 
+def _parse_vault_cursor(cursor: str) -> tuple[datetime, str]:
     try:
-        result = await get_vaults_by_user_id(db, user_id)
-        logger.debug("Retrieved user vaults successfully: %d records", len(result))
+        created_at, record_id = decode_cursor(cursor)
+        return datetime.fromisoformat(created_at), record_id
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
 
-        return VaultRecordsResponse(
-            status=True,
-            records=result
-        )
-    except Exception as e:
-        logger.error("Error retrieving user vaults: %s", e)
-        return VaultRecordsResponse(
-            status=False,
-            records=None,
-            message=str(e)
-        )
+@service_errors("retrieving user vaults", VaultRecordsResponse)
+async def get_user_vaults(user_id: str, db: AsyncSession, limit: Optional[int] = None, cursor: Optional[str] = None,
+                          owner: Optional[User] = None) -> dict | VaultRecordsResponse:
+    """Retrieve vault records for a specific user, optionally one page at a time.
+
+    Passing ``owner`` selects the compact envelope and skips loading the user per record.
+    """
+
+    after = _parse_vault_cursor(cursor) if cursor else None
 
+    # fetch one extra row to know whether another page follows
+    result = await get_vaults_by_user_id(db, user_id, limit=limit + 1 if limit else None, after=after,
+                                         with_owner=owner is None)
+    logger.debug("Retrieved user vaults successfully: %d records", len(result))
+
+    next_cursor = None
+    if limit and len(result) > limit:
+        result = result[:limit]
+        last = result[-1]
+        next_cursor = encode_cursor(last.created_at.isoformat(), last.id)
+
+    return _records_response(result, owner, next_cursor)
+
+async def get_user_vaults_snapshot(user_id: str, etag: str, db: AsyncSession, limit: Optional[int] = None,
+                                   cursor: Optional[str] = None, owner: Optional[User] = None) -> Snapshot | VaultRecordsResponse:
+    """get_user_vaults, served from the serialized snapshot cache while ``etag`` is current.
+
+    ``etag`` must be the one just read with get_vault_etag. Errors are returned
+    as the response model and never cached.
+    """
+    variant = (msgpack_requested(), owner is not None, limit, cursor)
+    snapshot = vault_snapshot_cache.get(user_id, variant, etag)
+    if snapshot is not None:
+        return snapshot
+
+    response = await get_user_vaults(user_id, db, limit=limit, cursor=cursor, owner=owner)
+    if not isinstance(response, dict):
+        return response
+
+    body, media_type = encode(response)
+    return vault_snapshot_cache.put(user_id, variant, etag, media_type, body)
+
+@service_errors("retrieving vault record by ID", VaultRecordResponse)
 async def get_user_vault_by_id(db: AsyncSession, record_id: str, user_id: str) -> VaultRecordResponse:
     """Retrieve a vault record by its ID."""
-    try:
-        vault_record = await get_vault_by_id(db, record_id)
-        if vault_record and vault_record.user_id == user_id:
-            logger.debug("Vault record with ID %s retrieved successfully.", record_id)
-            return VaultRecordResponse(
-                status=True,
-                record=vault_record
-            )
-        else:
-            logger.warning("Vault record with ID %s not found.", record_id)
-            return VaultRecordResponse(
-                status=False,
-                record=None
-            )
-    except Exception as e:
-        logger.error("Error retrieving vault record by ID: %s", e)
+    vault_record = await get_vault_by_id(db, record_id)
+    if vault_record and vault_record.user_id == user_id:
+        logger.debug("Vault record with ID %s retrieved successfully.", record_id)
+        return VaultRecordResponse(
+            status=True,
+            record=vault_record
+        )
+    else:
+        logger.warning("Vault record with ID %s not found.", record_id)
         return VaultRecordResponse(
             status=False,
-            record=None,
-            message=str(e)
+            record=None
         )
 
+@service_errors("deleting vault record", VaultRecordResponse)
 async def process_vault_delete(record_id: str, user_id: str, db: AsyncSession) -> VaultRecordResponse:
     """Delete a vault record by its ID."""
-    try:
-        vault_record = await get_vault_by_id(db, record_id)
-        if not vault_record or vault_record.user_id != user_id:
-            return VaultRecordResponse(
-                status=False,
-                record=None,
-                message="Vault record not found or access denied."
-            )
-
-        await db.delete(vault_record)
-        await db.commit()
-        logger.info("Vault record with ID %s deleted successfully.", record_id)
-        return VaultRecordResponse(
-            status=True,
-            record=None,
-            message="Vault record deleted successfully."
-        )
-    except Exception as e:
-        logger.error("Error deleting vault record: %s", e)
+    # DELETE ... WHERE user_id AND id RETURNING id; the record is never loaded
+    if not await delete_vaults(db, user_id, [record_id]):
+        await db.rollback()
         return VaultRecordResponse(
             status=False,
             record=None,
-            message=str(e)
+            message="Vault record not found or access denied."
         )
 
+    await db.commit()
+    vault_snapshot_cache.invalidate_user(user_id)
+    recent_writes.mark(user_id)
+    logger.info("Vault record with ID %s deleted successfully.", record_id)
+    return VaultRecordResponse(
+        status=True,
+        record=None,
+        message="Vault record deleted successfully."
+    )
+
+@service_errors("retrieving user vault tags", VaultTagsResponse)
 async def get_user_vault_tags(user_id: str, db: AsyncSession) -> VaultTagsResponse:
     """Retrieve all unique tags for a specific user's vault records."""
 
-    try:
-        tags_list = await get_unique_tags(db, user_id)
+    tag_counts = await get_unique_tags(db, user_id)
 
-        return VaultTagsResponse(
-            status=True,
-            tags=tags_list
-        )
-    except Exception as e:
-        logger.error("Error retrieving user vault tags: %s", e)
-        return VaultTagsResponse(
-            status=False,
-            tags=None,
-            message=str(e)
-        )
+    return VaultTagsResponse(
+        status=True,
+        tags=[tag for tag, _ in tag_counts],
+        tag_counts=[VaultTagCount(tag=tag, count=count) for tag, count in tag_counts]
+    )
 
-async def get_user_vault_by_tag(user_id: str, tag: str, db: AsyncSession) -> VaultRecordsResponse:
+@service_errors("retrieving vault records by tag", VaultRecordsResponse)
+async def get_user_vault_by_tag(user_id: str, tag: str, db: AsyncSession,
+                                owner: Optional[User] = None) -> dict | VaultRecordsResponse:
     """Retrieve vault records for a specific user filtered by tag."""
 
-    try:
-        all_vaults = await get_vaults_by_tag(db, user_id, tag)
+    all_vaults = await get_vaults_by_tag(db, user_id, tag, with_owner=owner is None)
         
-        return VaultRecordsResponse(
-            status=True,
-            records=all_vaults
-        )
-    except Exception as e:
-        logger.error("Error retrieving vault records by tag: %s", e)
-        return VaultRecordsResponse(
-            status=False,
-            records=None,
-            message=str(e)
-        )
+    return _records_response(all_vaults, owner)
+
+@service_errors("searching vault records", VaultRecordsResponse)
+async def search_vault_records(user_id: str, query: str | None, tag: str | None, db: AsyncSession,
+                               owner: Optional[User] = None, limit: Optional[int] = None) -> dict | VaultRecordsResponse:
+    """Search vault records for a specific user based on a query string (best matches first).
+
+    A text query returns the top ``limit`` matches (VAULT_SEARCH_DEFAULT_LIMIT
+    by default); a tag-only filter is not ranked and returns every record
+    carrying the tag unless ``limit`` is given.
+    """
+
+    if limit is None and query:
+        limit = settings.VAULT_SEARCH_DEFAULT_LIMIT
+
+    all_vaults = await search_vaults(db, user_id, query, tag, with_owner=owner is None, limit=limit)
+
+    return _records_response(all_vaults, owner)
+
+async def export_user_vaults(user_id: str, session_factory) -> AsyncIterator[bytes]:
+    """Streams the user's vault records as NDJSON, one batch of lines per chunk.
+
+    Opens its own session: the response body is produced after the request's
+    dependencies (and their session) have been torn down.
+    """
+    exported = 0
+    async with session_factory() as session:
+        try:
+            async for rows in stream_vaults_by_user_id(session, user_id, settings.VAULT_EXPORT_BATCH_SIZE):
+                yield b"".join(
+                    VaultRecord.model_validate(row).model_dump_json().encode() + b"\n" for row in rows
+                )
+                exported += len(rows)
+        except Exception as e:
+            # headers are already sent; the client sees a truncated stream
+            logger.error("Error exporting vault records after %d records: %s", exported, e)
+            raise
+    logger.info("Exported %d vault records for user ID: %s", exported, user_id)
+
+async def _iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            yield bytes(buffer[start:end])
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"NDJSON line exceeds {max_line_bytes} bytes")
+    if buffer:
+        yield bytes(buffer)
+
+@service_errors("importing vault records", VaultImportResponse)
+async def process_vault_import(user_id: str, chunks: AsyncIterator[bytes], db: AsyncSession) -> VaultImportResponse:
+    """Imports an NDJSON stream of vault records in one transaction (all or nothing).
 
-async def search_vault_records(user_id: str, query: str | None, tag: str | None, db: AsyncSession) -> VaultRecordsResponse:
-    """Search vault records for a specific user based on a query string."""
+    The body is parsed as it arrives and inserted in batches, so memory stays
+    bounded by the batch size rather than the upload size.
+    """
+    batch: list[dict] = []
+    tag_changes: dict[str, tuple[str, int]] = {}
+    imported = 0
+    line_no = 0
 
     try:
-        all_vaults = await search_vaults(db, user_id, query, tag)
+        async for line in _iter_ndjson_lines(chunks, settings.VAULT_IMPORT_MAX_LINE_BYTES):
+            line_no += 1
+            if not line.strip():
+                continue
 
-        return VaultRecordsResponse(
-            status=True,
-            records=all_vaults
-        )
-    except Exception as e:
-        logger.error("Error searching vault records: %s", e)
-        return VaultRecordsResponse(
+            record = VaultImportRecord.model_validate_json(line)
+            now = datetime.now()
+            batch.append({
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "title": record.title,
+                "login_id": record.login_id,
+                "notes": record.notes,
+                "password_ciphertext": record.password_ciphertext,
+                "encryption_iv": record.encryption_iv,
+                "tags": record.tags,
+                "tags_normalized": list(normalize_tags(record.tags)) if record.tags is not None else None,
+                "created_at": record.created_at or now,
+                "updated_at": now,
+            })
+            merge_tag_deltas(tag_changes, tag_delta(None, record.tags))
+
+            if len(batch) >= settings.VAULT_IMPORT_BATCH_SIZE:
+                await insert_vaults(db, batch)
+                imported += len(batch)
+                batch = []
+
+        await insert_vaults(db, batch)
+        imported += len(batch)
+        if imported:
+            # users row before vault_tags, the order every vault write locks
+            # them in (the bump is the owner lock upsert_vaults takes first);
+            # taken at the end so a slow upload does not hold it
+            await bump_vault_version(db, user_id)
+            await apply_tag_delta(db, user_id, tag_changes)
+        await db.commit()
+        vault_snapshot_cache.invalidate_user(user_id)
+        recent_writes.mark(user_id)
+    except (ValidationError, ValueError) as e:
+        await db.rollback()
+        logger.warning("Vault import rejected at line %d: %s", line_no, e)
+        return VaultImportResponse(
             status=False,
-            records=None,
-            message=str(e)
-        )
\ No newline at end of file
+            message=f"Invalid record on line {line_no}: {e}"
+        )
+
+    logger.info("Imported %d vault records for user ID: %s", imported, user_id)
+    return VaultImportResponse(
+        status=True,
+        imported=imported,
+        message="Vault records imported successfully."
+    )
@@ -0,0 +1,80 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.common import decode_cursor, encode_cursor
+from ..core.config import settings
+from ..crud.tombstone_crud import delete_expired_tombstones, get_tombstones_since
+from ..crud.vault_crud import get_vaults_by_user_id, get_vaults_changed_since
+from ..schemas.vault import VaultChangesResponse, vault_record_dict
+from .errors import service_errors
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_since(since: str) -> datetime:
+    try:
+        (watermark,) = decode_cursor(since)
+        return datetime.fromisoformat(watermark)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid since token")
+
+
+def _changes_response(records, deleted: list[str], reset: bool, next_since: str) -> dict:
+    """Plain data in the shape of VaultChangesResponse (see vault_service._records_response)."""
+    return {
+        "status": True,
+        "records": [vault_record_dict(record) for record in records],
+        "deleted": deleted,
+        "reset": reset,
+        "next_since": next_since,
+        "message": None,
+    }
+
+
+@service_errors("retrieving vault changes", VaultChangesResponse)
+async def get_vault_changes(user_id: str, since: Optional[str], db: AsyncSession) -> dict | VaultChangesResponse:
+    """Records changed and ids deleted after the ``since`` watermark, plus the next watermark.
+
+    The window reaches VAULT_SYNC_GRACE_SECONDS behind the watermark so that a
+    write stamped just before the previous call but committed just after it
+    is not missed; clients apply changes by id, so the overlap is harmless.
+    Without a watermark, or with one older than the tombstone retention, the
+    full vault is returned with ``reset`` set.
+    """
+    watermark = _parse_since(since) if since else None
+    now = datetime.now()
+    next_since = encode_cursor(now.isoformat())
+
+    window_start = watermark - timedelta(seconds=settings.VAULT_SYNC_GRACE_SECONDS) if watermark else None
+    retention_start = now - timedelta(days=settings.VAULT_TOMBSTONE_RETENTION_DAYS)
+
+    if window_start is None or window_start < retention_start:
+        records = await get_vaults_by_user_id(db, user_id, with_owner=False)
+        logger.debug("Full vault sync: %d records", len(records))
+        return _changes_response(records, [], True, next_since)
+
+    records = await get_vaults_changed_since(db, user_id, window_start)
+    deleted = await get_tombstones_since(db, user_id, window_start)
+    logger.debug("Delta vault sync: %d changed, %d deleted", len(records), len(deleted))
+
+    return _changes_response(records, deleted, False, next_since)
+
+
+async def run_tombstone_compactor(session_factory, interval: int) -> None:
+    """Lifespan task: drops tombstones past the retention window every ``interval`` seconds."""
+    while True:
+        try:
+            async with session_factory() as session:
+                before = datetime.now() - timedelta(days=settings.VAULT_TOMBSTONE_RETENTION_DAYS)
+                removed = await delete_expired_tombstones(session, before)
+                if removed:
+                    logger.info("Compacted %d vault tombstones", removed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Failed to compact vault tombstones: %s", e)
+        await asyncio.sleep(interval)
@@ -0,0 +1,137 @@
+"""Per-call Python overhead of the hot read queries.
+
+Compares statements rebuilt with select(...) on every call (the previous
+crud code, kept here for comparison) with the lambda statements now used by
+vault_crud / user_crud. Each call builds the statement and looks it up in a
+compiled cache the way the engine does before sending it, which is the
+work repeated on every request; no database is needed.
+
+    python -m benchmarks.hot_query_overhead [--calls 20000]
+"""
+import argparse
+import asyncio
+from datetime import datetime
+import time
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import selectinload
+from sqlalchemy.util import LRUCache
+
+from app.crud.user_crud import get_user_by_email, get_vault_version
+from app.crud.vault_crud import get_vaults_by_user_id, search_vaults
+from app.models.user import User
+from app.models.vault import Vault
+
+
+class _CompileOnlySession:
+    """Stands in for AsyncSession: runs the engine's compiled-cache lookup and returns no rows."""
+
+    def __init__(self):
+        self.dialect = postgresql.asyncpg.dialect()
+        self.cache = LRUCache(1200)
+
+    async def execute(self, stmt):
+        stmt._compile_w_cache(self.dialect, compiled_cache=self.cache, column_keys=[])
+        return self
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return []
+
+    def first(self):
+        return None
+
+    def scalar_one_or_none(self):
+        return None
+
+
+# the statements as they were built before, one select(...) per call
+async def _select_vault_version(session, user_id):
+    await session.execute(select(User.vault_version).where(User.id == user_id))
+
+
+async def _select_user_by_email(session, email):
+    await session.execute(select(User).where(User.email == email).where(User.deleted_at.is_(None)))
+
+
+async def _select_vault_page(session, user_id, limit, after):
+    stmt = (
+        select(Vault)
+        .where(Vault.user_id == user_id)
+        .order_by(Vault.created_at.desc(), Vault.id.desc())
+        .options(selectinload(Vault.user))
+        .where(tuple_(Vault.created_at, Vault.id) < tuple_(*after))
+        .limit(limit)
+    )
+    await session.execute(stmt)
+
+
+async def _select_vault_search(session, user_id, query, tag, limit):
+    pattern = f"%{query}%"
+    stmt = (
+        select(Vault)
+        .where(Vault.user_id == user_id)
+        .where(func.lower(Vault.title).like(pattern, escape="/") | func.lower(Vault.notes).like(pattern, escape="/"))
+        .order_by(
+            func.greatest(
+                func.similarity(func.lower(Vault.title), query),
+                func.similarity(func.lower(Vault.notes), query),
+            ).desc(),
+            Vault.created_at.desc(),
+        )
+        .where(Vault.tags_normalized.contains([tag]))
+        .limit(limit)
+    )
+    await session.execute(stmt)
+
+
+CASES = {
+    "vault_version": (
+        lambda s, i: _select_vault_version(s, f"user-{i}"),
+        lambda s, i: get_vault_version(s, f"user-{i}"),
+    ),
+    "user_by_email": (
+        lambda s, i: _select_user_by_email(s, f"user{i}@example.com"),
+        lambda s, i: get_user_by_email(s, f"user{i}@example.com"),
+    ),
+    "vault_page": (
+        lambda s, i: _select_vault_page(s, f"user-{i}", 50, (datetime.now(), f"id-{i}")),
+        lambda s, i: get_vaults_by_user_id(s, f"user-{i}", limit=50, after=(datetime.now(), f"id-{i}")),
+    ),
+    "vault_search": (
+        lambda s, i: _select_vault_search(s, f"user-{i}", f"q{i}", "work", 50),
+        lambda s, i: search_vaults(s, f"user-{i}", f"q{i}", "work", with_owner=False, limit=50),
+    ),
+}
+
+
+async def _per_call_us(call, calls: int) -> float:
+    session = _CompileOnlySession()
+    await call(session, -1)  # warm the compiled cache
+    started = time.perf_counter()
+    for i in range(calls):
+        await call(session, i)
+    return (time.perf_counter() - started) / calls * 1_000_000
+
+
+async def measure(calls: int) -> dict:
+    results = {}
+    for name, (rebuilt, cached) in CASES.items():
+        results[name] = {
+            "select_us": round(await _per_call_us(rebuilt, calls), 1),
+            "lambda_us": round(await _per_call_us(cached, calls), 1),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20_000)
+    args = parser.parse_args()
+
+    for name, result in asyncio.run(measure(args.calls)).items():
+        print(f"{name}: select={result['select_us']}us lambda={result['lambda_us']}us "
+              f"saved={result['select_us'] - result['lambda_us']:.1f}us/call")
@@ -0,0 +1,87 @@
+"""Payload size and query count of the vault list envelopes.
+
+Compares the full envelope (owner embedded in every record) with the
+compact one (owner sent once). Payload sizes use synthetic records; pass
+--db to also count the SQL statements each variant issues against the
+database configured in .env (the user must already have records).
+
+    python -m benchmarks.vault_list_payload [--records 1000] [--db USER_ID]
+"""
+import argparse
+import asyncio
+from datetime import datetime
+import os
+import uuid
+
+from app.schemas.user import UserInfo
+from app.schemas.vault import VaultCompactRecordsResponse, VaultInfo, VaultRecord, VaultRecordsResponse
+
+
+def _synthetic_records(count: int) -> tuple[UserInfo, list[dict]]:
+    owner = UserInfo(id=str(uuid.uuid4()), full_name="John Doe", email="john.doe@example.com")
+    records = [
+        {
+            "id": str(uuid.uuid4()),
+            "title": f"Account {i}",
+            "login_id": f"user{i}@example.com",
+            "notes": "some notes",
+            "password_ciphertext": os.urandom(48),
+            "encryption_iv": os.urandom(24),
+            "tags": ["work", "email"],
+            "created_at": datetime.now(),
+            "updated_at": datetime.now(),
+        }
+        for i in range(count)
+    ]
+    return owner, records
+
+
+def payload_sizes(count: int) -> dict:
+    owner, records = _synthetic_records(count)
+
+    full = VaultRecordsResponse(
+        status=True,
+        records=[VaultInfo(**r, user=owner) for r in records],
+    ).model_dump_json()
+    compact = VaultCompactRecordsResponse(
+        status=True,
+        owner=owner,
+        records=[VaultRecord(**r) for r in records],
+    ).model_dump_json()
+
+    return {"full_bytes": len(full), "compact_bytes": len(compact)}
+
+
+async def query_counts(user_id: str) -> dict:
+    from sqlalchemy import event
+    from app.crud.vault_crud import get_vaults_by_user_id
+    from app.database.session import AsyncSessionLocal, engine
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        counts = {}
+        for name, with_owner in (("full", True), ("compact", False)):
+            statements.clear()
+            async with AsyncSessionLocal() as session:
+                await get_vaults_by_user_id(session, user_id, with_owner=with_owner)
+            counts[f"{name}_queries"] = len(statements)
+        return counts
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--db", metavar="USER_ID", help="also count queries for this user's vault")
+    args = parser.parse_args()
+
+    sizes = payload_sizes(args.records)
+    print(f"records={args.records} full={sizes['full_bytes']}B compact={sizes['compact_bytes']}B "
+          f"saved={1 - sizes['compact_bytes'] / sizes['full_bytes']:.1%}")
+
+    if args.db:
+        print(asyncio.run(query_counts(args.db)))
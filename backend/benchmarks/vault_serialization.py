@@ -0,0 +1,83 @@
+"""Serialization time of the vault list response.
+
+Compares the previous path (envelope model built from ORM-like objects,
+re-validated against response_model by FastAPI, rendered with json.dumps)
+with the plain-dict builder rendered by FastJSONResponse, for 1k and 10k
+synthetic records.
+
+    python -m benchmarks.vault_serialization [--repeat 5]
+"""
+import argparse
+import asyncio
+from datetime import datetime
+import json
+import os
+import time
+from types import SimpleNamespace
+import uuid
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.core.serialization import FastJSONResponse
+from app.schemas.vault import VaultRecordsResponse
+from app.services.vault_service import _records_response
+
+
+def _synthetic_records(count: int) -> list[SimpleNamespace]:
+    owner = SimpleNamespace(id=str(uuid.uuid4()), full_name="John Doe", email="john.doe@example.com")
+    return [
+        SimpleNamespace(
+            id=str(uuid.uuid4()),
+            user_id=owner.id,
+            user=owner,
+            title=f"Account {i}",
+            login_id=f"user{i}@example.com",
+            notes="some notes",
+            password_ciphertext=os.urandom(48),
+            encryption_iv=os.urandom(24),
+            tags=["work", "email"],
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+        )
+        for i in range(count)
+    ]
+
+
+async def _model_path(records, field) -> bytes:
+    model = VaultRecordsResponse(status=True, records=records)
+    content = await serialize_response(field=field, response_content=model)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+async def _fast_path(records, field) -> bytes:
+    return FastJSONResponse(_records_response(records)).body
+
+
+async def measure(count: int, repeat: int) -> dict:
+    records = _synthetic_records(count)
+    field = create_model_field(name="Response", type_=VaultRecordsResponse, mode="serialization")
+
+    results = {}
+    for name, render in (("model", _model_path), ("fast", _fast_path)):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = await render(records, field)
+            best = min(best, time.perf_counter() - started)
+        results[name] = {"ms": round(best * 1000, 2), "bytes": len(body)}
+
+    # both paths must produce the same document
+    assert json.loads(await _model_path(records, field)) == json.loads(await _fast_path(records, field))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for count in (1_000, 10_000):
+        result = asyncio.run(measure(count, args.repeat))
+        print(f"records={count} model={result['model']['ms']}ms fast={result['fast']['ms']}ms "
+              f"speedup={result['model']['ms'] / result['fast']['ms']:.1f}x")
@@ -0,0 +1,95 @@
+"""Latency and statement count of vault record writes.
+
+Measures, against the database configured in .env, the previous ORM update
+path (load with owner, session.get, commit, re-select with owner), the
+current update path (one UPDATE ... RETURNING) and the create path (one
+INSERT ... RETURNING). Statements are counted per write, the tag index
+statements included (the records written carry no tags). Scratch records
+are created for USER_ID and removed afterwards.
+
+    python -m benchmarks.vault_write_latency USER_ID [--iterations 200]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import selectinload
+
+from app.crud.vault_crud import create_update_vault, delete_vault_by_id
+from app.database.session import AsyncSessionLocal, engine
+from app.models.vault import Vault
+from app.schemas.vault import VaultRecordRequest
+
+
+async def _orm_update(session, request: VaultRecordRequest) -> None:
+    # the write path before the upsert, kept here for comparison
+    await session.execute(select(Vault).options(selectinload(Vault.user)).where(Vault.id == request.id))
+    db_vault = await session.get(Vault, request.id)
+    db_vault.title = request.title
+    db_vault.login_id = request.login_id
+    db_vault.notes = request.notes
+    db_vault.password_ciphertext = request.password_ciphertext
+    db_vault.encryption_iv = request.encryption_iv
+    await session.commit()
+    await session.execute(select(Vault).options(selectinload(Vault.user)).where(Vault.id == request.id))
+
+
+async def measure(user_id: str, iterations: int) -> dict:
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+
+    def request(vault_id=None, i=0):
+        return VaultRecordRequest(
+            id=vault_id, user_id=user_id, title=f"bench {i}", login_id="bench@example.com",
+            notes="benchmark", password_ciphertext=os.urandom(48), encryption_iv=os.urandom(24),
+        )
+
+    results = {}
+    created = []
+    try:
+        async with AsyncSessionLocal() as session:
+            vault_id = (await create_update_vault(session, request())).id
+        created.append(vault_id)
+
+        cases = (
+            ("orm_update", _orm_update, lambda i: request(vault_id, i)),
+            ("update", create_update_vault, lambda i: request(vault_id, i)),
+            ("create", create_update_vault, lambda i: request(None, i)),
+        )
+        for name, write, make_request in cases:
+            timings = []
+            statements.clear()
+            for i in range(iterations):
+                async with AsyncSessionLocal() as session:
+                    started = time.perf_counter()
+                    row = await write(session, make_request(i))
+                    timings.append((time.perf_counter() - started) * 1000)
+                if name == "create":
+                    created.append(row.id)
+            results[name] = {
+                "p50_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(statistics.quantiles(timings, n=20)[-1], 3),
+                "statements_per_write": round(len(statements) / iterations, 2),
+            }
+
+        async with AsyncSessionLocal() as session:
+            for created_id in created:
+                await delete_vault_by_id(session, user_id, created_id)
+        return results
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("user_id")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    for name, result in asyncio.run(measure(args.user_id, args.iterations)).items():
+        print(f"{name:10} {result}")
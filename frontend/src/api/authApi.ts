@@ -20,6 +20,7 @@ export async function registerUserStartRequest(request: RegisterStartRequest): P
         });
 
         const response: RegisterStartResponse = {
+            handshakeId: serverResp.data.handshake_id,
             registrationResponse: serverResp.data.registration_response,
         };
 
@@ -33,6 +34,7 @@ export async function registerUserStartRequest(request: RegisterStartRequest): P
 export async function finalizeUserRegister(request: RegisterFinishRequest): Promise<RegisterFinishResponse> {
     try {
         const serverResp = await apiClient.post(appConfig.API.ENDPOINTS.REGISTER_FINISH, {
+            handshake_id: request.handshakeId,
             user_info: { full_name: request.userInfo.fullName, email: request.userInfo.email },
             master_key_salt: request.masterKeySalt,
             encrypted_vault_key: request.encryptedVaultKey,
@@ -58,7 +60,7 @@ export async function loginStartRequest(request: LoginStartRequest): Promise<Log
             login_request: request.loginRequest
         });
 
-        return { loginResponse: response.data.login_response };
+        return { handshakeId: response.data.handshake_id, loginResponse: response.data.login_response };
 
     } catch (error: any) {
         console.error("loginStartRequest - error", error);
@@ -69,6 +71,7 @@ export async function loginStartRequest(request: LoginStartRequest): Promise<Log
 export async function finalizeUserLogin(request: LoginFinishRequest): Promise<LoginFinishResponse> {
     try {
         const response = await apiClient.post(appConfig.API.ENDPOINTS.LOGIN_FINISH, {
+            handshake_id: request.handshakeId,
             email: request.email,
             finish_login_request: request.finishLoginRequest
         });
@@ -74,6 +74,7 @@ export async function resetMasterPasswordStartRequest(request: ResetMasterPasswo
         });
 
         const response: ResetMasterPasswordStartResponse = {
+            handshakeId: serverResp.data.handshake_id,
             registrationResponse: serverResp.data.registration_response,
         };
 
@@ -87,6 +88,7 @@ export async function resetMasterPasswordStartRequest(request: ResetMasterPasswo
 export async function finalizeResetMasterPassword(request: ResetMasterPasswordFinishRequest): Promise<ResetMasterPasswordFinishResponse> {
     try {
         const serverResp = await apiClient.post(appConfig.API.ENDPOINTS.USER_RESET_MASTER_PWD_FINISH, {
+            handshake_id: request.handshakeId,
             user_id: request.id,
             master_key_salt: request.masterKeySalt,
             encrypted_vault_key: request.encryptedVaultKey,
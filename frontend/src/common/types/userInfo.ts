@@ -30,10 +30,12 @@ export interface RegisterStartRequest {
 }
 
 export interface RegisterStartResponse {
+    handshakeId: string;
     registrationResponse: string;
 }
 
 export interface RegisterFinishRequest {
+    handshakeId: string;
     userInfo: UserInfo;
     masterKeySalt: string;
     encryptedVaultKey: string;
@@ -57,10 +59,12 @@ export interface LoginStartRequest {
 }
 
 export interface LoginStartResponse {
+  handshakeId: string;
   loginResponse: string;
 }
 
 export interface LoginFinishRequest {
+  handshakeId: string;
   email: string;
   finishLoginRequest: string;
 }
@@ -103,10 +107,12 @@ export interface ResetMasterPasswordStartRequest {
 }
 
 export interface ResetMasterPasswordStartResponse {
+    handshakeId: string;
     registrationResponse: string;
 }
 
 export interface ResetMasterPasswordFinishRequest {
+    handshakeId: string;
     id: string;
     masterKeySalt: string;
     encryptedVaultKey: string;
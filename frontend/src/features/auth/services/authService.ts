@@ -22,7 +22,7 @@ export async function register(formData: RegisterFormData) {
             return false;
         }
 
-        const { registrationResponse } = await api.registerUserStartRequest({
+        const { handshakeId, registrationResponse } = await api.registerUserStartRequest({
             email: formData.email,
             registrationRequest: registrationRequest,
         });
@@ -40,6 +40,7 @@ export async function register(formData: RegisterFormData) {
         // await clearMemory(derivedVaultKeys.masterKey, derivedVaultKeys.vaultKey);
 
         const regiserPayload = {
+            handshakeId,
             userInfo: {
                 fullName: formData.fullName,
                 email: formData.email,
@@ -72,7 +73,7 @@ export async function processLogin(formData: LoginFormData): Promise<LoginInfo |
             email: formData.email,
             loginRequest: startLoginRequest,
         };
-        const { loginResponse } = await api.loginStartRequest(loginStartRequest);
+        const { handshakeId, loginResponse } = await api.loginStartRequest(loginStartRequest);
 
         // finish login
         const loginResult = await clientFinishLogin(formData, clientLoginState, loginResponse);
@@ -80,6 +81,7 @@ export async function processLogin(formData: LoginFormData): Promise<LoginInfo |
         // send to server to verify and get session token
         if (loginResult) {
             const response = await api.finalizeUserLogin({
+                handshakeId,
                 email: formData.email,
                 finishLoginRequest: loginResult.finishLoginRequest,
             });
@@ -73,7 +73,7 @@ export const useSettingService = () => {
                 return false;
             }
 
-            const { registrationResponse } = await api.resetMasterPasswordStartRequest({
+            const { handshakeId, registrationResponse } = await api.resetMasterPasswordStartRequest({
                         email: userInfo!.email!,
                         registrationRequest: registrationRequest,
                     });
@@ -86,6 +86,7 @@ export const useSettingService = () => {
 
             // 7. send to backend to update master key verifier, encryptedVaultKey and vaultKeyNonce
             const resetPayload: ResetMasterPasswordFinishRequest = {
+                handshakeId,
                 id: userInfo!.id!,
                 masterKeySalt: toStrUrlSafeBase64(newMasterKeySalt),
                 encryptedVaultKey: toStrUrlSafeBase64(vaultKeyEncrypted!),